@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the Telegram Group & Channel Manager
+
+Runs the engine and the GUI against a synthetic account served by the fake
+Telegram backend, so performance can be measured without a real account and
+regressions show up as numbers. Measured:
+
+    fetch         full and incremental fetch through the engine, a full fetch
+                  with one iterator instead of one per folder, and a full fetch
+                  with flood waits injected at --fetch-flood-rate
+    gui fetch     a full fetch through the GUI's worker thread, batches merged into the list
+    populate      filling the group list with every fetched group
+    filter        applying the search filter after each keystroke
+    sort          re-sorting the list by each column
+    keep import   resolving a keep list of @usernames and invite links, first
+                  on Telegram and then again from the resolution cache
+    leave         leave throughput, with flood waits injected at --flood-rate
+    startup       cold start of the GUI in a fresh interpreter, with the fetched groups cached
+
+After each part the request and UI phase timings collected by the engine and
+the window are printed, which shows how much of the time is spent waiting on
+Telegram and how much in the GUI. The exit status is 1 when the cold start
+exceeds STARTUP_BUDGET or imports Telethon before connecting.
+
+The GUI benchmarks run on an offscreen display and are skipped without PyQt5.
+Every run works in a temporary directory and touches no saved data.
+
+Examples:
+    python telegram_benchmark.py
+    python telegram_benchmark.py --dialogs 50000 --latency 0.05 --jitter 0.02
+    python telegram_benchmark.py --flood-rate 0.02 --json results.json
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+from telegram_engine import (AdaptiveRateLimiter, DialogCache, LeaveJournal, OperationLog,
+                             ResolutionCache, TelegramEngine, parse_keep_list,
+                             resolve_keep_entries_locally)
+from telegram_fake import FakeBackend
+
+# Cold start limits in seconds, from the start of telegram_group_manager's
+# imports: the window must appear, and then show the cached groups, within these
+STARTUP_BUDGET = {
+    'startup window shown': 0.3,
+    'startup cached groups shown': 1.0,
+}
+
+# Starts the GUI in a fresh interpreter the way main() does and reports its start-up timings
+STARTUP_SCRIPT = """
+import sys, json
+from PyQt5.QtWidgets import QApplication
+import telegram_group_manager
+app = QApplication(sys.argv)
+window = telegram_group_manager.show_main_window(app)
+phases = window.metrics.phases
+print(json.dumps({
+    'window': phases['startup_window_shown'].sum,
+    'groups': phases['startup_cached_groups_shown'].sum,
+    'rows': window.groups_model.rowCount(),
+    'telethon': 'telethon' in sys.modules,
+}))
+"""
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the group manager against a fake Telegram account")
+    parser.add_argument('--dialogs', type=int, default=20000, help="Dialogs in the synthetic account (default: 20000)")
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help="Seconds added to every request (default: 0.02)")
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help="Random extra seconds, up to this much, added to every request")
+    parser.add_argument('--flood-rate', type=float, default=0.0,
+                        help="Chance that a leave request fails with a flood wait (default: 0)")
+    parser.add_argument('--fetch-flood-rate', type=float, default=0.02,
+                        help="Chance that a request of the flood wait fetch fails with a flood "
+                             "wait (default: 0.02)")
+    parser.add_argument('--flood-seconds', type=int, default=1,
+                        help="Length of the injected flood waits (default: 1)")
+    parser.add_argument('--import-count', type=int, default=1000,
+                        help="Entries in the keep list import benchmark (default: 1000)")
+    parser.add_argument('--leave-count', type=int, default=300,
+                        help="Groups left in the leave benchmark (default: 300)")
+    parser.add_argument('--leave-rate', type=float, default=50.0,
+                        help="Fixed leave rate in requests per second; 0 uses the adaptive "
+                             "rate limiter with its normal settings (default: 50)")
+    parser.add_argument('--query', default="music football",
+                        help="Search text typed one keystroke at a time (default: 'music football')")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic account")
+    parser.add_argument('--no-gui', action='store_true', help="Skip the GUI benchmarks")
+    parser.add_argument('--json', metavar='FILE', help="Also write the results as JSON")
+    return parser.parse_args(argv)
+
+class Results:
+    """Collects named measurements and prints each one as it is taken"""
+    
+    def __init__(self):
+        self.values = {}
+        
+    def add(self, name, value, unit):
+        self.values[name] = {'value': round(value, 3), 'unit': unit}
+        print(f"{name:<34} {value:>12.3f} {unit}", flush=True)
+        
+    def add_timings(self, name, timings):
+        """Record the median and worst of several timings in seconds as milliseconds"""
+        self.add(f"{name} median", statistics.median(timings) * 1000, "ms")
+        self.add(f"{name} max", max(timings) * 1000, "ms")
+
+def create_engine():
+    """Create an engine keeping its cache, journal and log in the working directory"""
+    return TelegramEngine(1, "benchmark", "+10000000000", session_name="benchmark",
+                          dialog_cache=DialogCache("benchmark.groups.db"),
+                          journal=LeaveJournal("benchmark.jobs.db"),
+                          operation_log=OperationLog("benchmark_log.jsonl"),
+                          resolve_cache=ResolutionCache("benchmark.resolved.db"))
+
+def keep_list_text(backend, count):
+    """Write a keep list of up to count entries: half @usernames, users included, half invite links"""
+    usernames = [f"@{entity.username}" for _, entity, _ in backend.dialogs()
+                 if getattr(entity, 'username', None)][:count // 2]
+    invites = [f"https://t.me/+{invite}" for invite in backend.invites]
+    return "\n".join(usernames + invites[:count - len(usernames)])
+
+async def benchmark_import(args, backend, engine, groups, results):
+    """Measure resolving a keep list, first on Telegram and then from the cache"""
+    entries, _ = parse_keep_list(keep_list_text(backend, args.import_count))
+    if args.leave_rate:
+        engine.resolve_rate_limiter = AdaptiveRateLimiter(rate=args.leave_rate,
+                                                          max_rate=args.leave_rate)
+    for run in ("first", "cached"):
+        requests = backend.requests
+        start = time.perf_counter()
+        resolved, _, remaining = resolve_keep_entries_locally(entries, groups, engine.resolve_cache)
+        if remaining:
+            found, _, _ = await engine.resolve_keep_entries(remaining)
+            resolved.update(found)
+        results.add(f"keep import {run}", time.perf_counter() - start, "s")
+        results.add(f"keep import {run} lookups", backend.requests - requests, "requests")
+    results.add("keep import resolved", len(resolved), "entries")
+
+async def benchmark_engine(args, backend, results):
+    """Measure fetching and leaving through the engine"""
+    engine = create_engine()
+    try:
+        start = time.perf_counter()
+        groups, _ = await engine.fetch_groups()
+        elapsed = time.perf_counter() - start
+        results.add("fetch full", elapsed, "s")
+        results.add("fetch full throughput", len(backend) / elapsed, "dialogs/s")
+        results.add("fetch groups found", len(groups), "groups")
+        
+        start = time.perf_counter()
+        await engine.fetch_groups(by_folder=False)
+        results.add("fetch full single listing", time.perf_counter() - start, "s")
+        
+        start = time.perf_counter()
+        await engine.fetch_groups(incremental=True)
+        results.add("fetch incremental", time.perf_counter() - start, "s")
+        
+        if args.fetch_flood_rate:
+            backend.flood_rate = args.fetch_flood_rate
+            backend.flood_waits = 0
+            start = time.perf_counter()
+            try:
+                await engine.fetch_groups()
+            finally:
+                backend.flood_rate = 0.0
+            results.add("fetch full with flood waits", time.perf_counter() - start, "s")
+            results.add("fetch flood waits", backend.flood_waits, "waits")
+            
+        if args.import_count:
+            await benchmark_import(args, backend, engine, groups, results)
+            
+        if args.leave_rate:
+            engine.rate_limiter = AdaptiveRateLimiter(rate=args.leave_rate, max_rate=args.leave_rate)
+        to_leave = groups[-args.leave_count:] if args.leave_count else []
+        backend.flood_rate = args.flood_rate
+        backend.flood_waits = 0
+        start = time.perf_counter()
+        leave_results, _ = await engine.leave_groups(to_leave)
+        elapsed = time.perf_counter() - start
+        backend.flood_rate = 0.0
+        succeeded = sum(1 for _, status, _ in leave_results if status == "Success")
+        results.add("leave elapsed", elapsed, "s")
+        results.add("leave throughput", succeeded / elapsed if elapsed else 0, "groups/s")
+        results.add("leave failed", len(leave_results) - succeeded, "groups")
+        results.add("leave flood waits", backend.flood_waits, "waits")
+    finally:
+        await engine.disconnect()
+    print()
+    print(engine.metrics.describe())
+    print()
+
+def benchmark_gui(args, backend, results):
+    """Measure fetching through the worker thread and the list operations of the main window
+    
+    Returns False if PyQt5 is missing.
+    """
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    try:
+        from PyQt5.QtCore import QEventLoop, Qt
+        from PyQt5.QtWidgets import QApplication
+        from telegram_group_manager import GroupTableModel, TelegramGroupManager
+    except ImportError as e:
+        print(f"Skipping the GUI benchmarks: {e}")
+        return False
+        
+    app = QApplication.instance() or QApplication(sys.argv)
+    window = TelegramGroupManager()
+    window.show()
+    window.api_id_input.setPlainText("1")
+    window.api_hash_input.setPlainText("benchmark")
+    window.phone_input.setPlainText("+10000000000")
+    app.processEvents()
+    
+    try:
+        loop = QEventLoop()
+        window.get_worker(window.current_account()).operation_complete.connect(loop.quit)
+        start = time.perf_counter()
+        window.full_refresh_groups()
+        loop.exec_()
+        results.add("gui fetch full", time.perf_counter() - start, "s")
+        groups = list(window.groups)
+        
+        timings = []
+        for _ in range(5):
+            start = time.perf_counter()
+            window.display_groups(groups)
+            app.processEvents()
+            timings.append(time.perf_counter() - start)
+        results.add_timings("populate", timings)
+        
+        timings = []
+        for text in [args.query[:length] for length in range(1, len(args.query) + 1)]:
+            window.search_input.setText(text)
+            start = time.perf_counter()
+            window.filter_groups()
+            app.processEvents()
+            timings.append(time.perf_counter() - start)
+        for length in range(len(args.query) - 1, -1, -1):
+            window.search_input.setText(args.query[:length])
+            start = time.perf_counter()
+            window.filter_groups()
+            app.processEvents()
+            timings.append(time.perf_counter() - start)
+        results.add_timings("filter per keystroke", timings)
+        
+        timings = []
+        for column in range(len(GroupTableModel.HEADERS)):
+            for descending in (False, True):
+                start = time.perf_counter()
+                window.sort_by_column(column, Qt.DescendingOrder if descending
+                                      else Qt.AscendingOrder)
+                app.processEvents()
+                timings.append(time.perf_counter() - start)
+        results.add_timings("sort per column", timings)
+    finally:
+        window.close()
+    print()
+    print(window.metrics.describe())
+    print()
+    return True
+
+def benchmark_startup(results, runs=3):
+    """Measure cold start of the GUI with the cached groups, against STARTUP_BUDGET
+    
+    Returns the names of the measurements over budget.
+    """
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get('QT_QPA_PLATFORM', 'offscreen'),
+               PYTHONPATH=os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(__file__)),
+                                                        os.environ.get('PYTHONPATH')])))
+    reports = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], env=env, check=True,
+                                capture_output=True, text=True).stdout
+        reports.append(json.loads(output.strip().splitlines()[-1]))
+        
+    results.add("startup cached groups", reports[-1]['rows'], "groups")
+    over_budget = []
+    for name, key in (('startup window shown', 'window'),
+                      ('startup cached groups shown', 'groups')):
+        value = statistics.median(report[key] for report in reports)
+        results.add(name, value, "s")
+        if value > STARTUP_BUDGET[name]:
+            over_budget.append(f"{name}: {value:.3f}s, budget {STARTUP_BUDGET[name]}s")
+    if any(report['telethon'] for report in reports):
+        over_budget.append("Telethon was imported before the first connect")
+    return over_budget
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+    backend = FakeBackend(dialogs=args.dialogs, latency=args.latency, jitter=args.jitter,
+                          flood_seconds=args.flood_seconds, seed=args.seed)
+    print(f"Synthetic account with {len(backend)} dialogs created in "
+          f"{time.perf_counter() - start:.1f}s")
+          
+    results = Results()
+    over_budget = []
+    previous_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory, backend.installed():
+        os.chdir(directory)
+        try:
+            asyncio.run(benchmark_engine(args, backend, results))
+            # The GUI fetch leaves the group cache that the cold start then loads
+            if not args.no_gui and benchmark_gui(args, backend, results):
+                over_budget = benchmark_startup(results)
+        finally:
+            os.chdir(previous_directory)
+            
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'dialogs': args.dialogs, 'latency': args.latency, 'jitter': args.jitter,
+                       'flood_rate': args.flood_rate, 'results': results.values}, f, indent=2)
+    for problem in over_budget:
+        print(f"Over budget: {problem}", file=sys.stderr)
+    return 1 if over_budget else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
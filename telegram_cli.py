@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""
+Telegram Group & Channel Manager from the command line
+
+Runs the same fetch and leave engine as the GUI without loading PyQt5, so it can
+be scripted or run from cron on a headless machine. Several accounts can be
+processed at once; each gets its own client and rate limiter on one event loop.
+
+Examples:
+    python telegram_cli.py fetch --format csv --output groups.csv
+    python telegram_cli.py leave --dry-run
+    python telegram_cli.py leave --keep-file keep.txt --yes
+    python telegram_cli.py leave --resume
+    python telegram_cli.py log --status Failed --error ChannelPrivateError --since 7d
+    python telegram_cli.py import-keep keep.csv
+    python telegram_cli.py --all-accounts leave --yes
+"""
+
+import os
+import re
+import sys
+import csv
+import json
+import signal
+import asyncio
+import argparse
+from datetime import datetime, timedelta
+
+from telegram_engine import (DEFAULT_ACCOUNT, Account, AuthenticationError, DialogCache,
+                             GroupRecord, GroupStore, KeepListStore, LeaveJournal, Metrics,
+                             OperationLog, ResolutionCache, TelegramEngine, describe_entry,
+                             load_accounts, load_credentials, parse_keep_list,
+                             resolve_keep_entries_locally)
+from telegram_rules import KeepPolicy, RuleError
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Manage Telegram groups and channels without the GUI")
+    parser.add_argument('--api-id', help="Telegram API ID (defaults to the saved credentials)")
+    parser.add_argument('--api-hash', help="Telegram API hash (defaults to the saved credentials)")
+    parser.add_argument('--phone', help="Phone number (defaults to the saved credentials)")
+    parser.add_argument('--account', action='append', metavar='NAME',
+                        help="Saved account to use; repeat to process several accounts at once")
+    parser.add_argument('--all-accounts', action='store_true', help="Process every saved account")
+    parser.add_argument('-q', '--quiet', action='store_true', help="Do not print status messages")
+    parser.add_argument('--single-listing', action='store_true',
+                        help="Fetch all dialogs with one iterator instead of reading the main "
+                             "list and the archive concurrently")
+    parser.add_argument('--metrics-file', metavar='FILE',
+                        help="Write request latencies, retries and flood waits to FILE in the "
+                             "Prometheus text format when done")
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    fetch = commands.add_parser('fetch', help="Write your groups and channels as JSON or CSV")
+    fetch.add_argument('--refresh', choices=['full', 'incremental', 'none'], default='full',
+                       help="How to update the group list first; 'none' uses the local cache "
+                            "without connecting (default: full)")
+    fetch.add_argument('--format', choices=['json', 'csv'], default='json')
+    fetch.add_argument('--output', help="File to write to (default: standard output)")
+    
+    leave = commands.add_parser('leave', help="Leave every group not in the keep file")
+    leave.add_argument('--refresh', choices=['full', 'incremental', 'none'], default='incremental',
+                       help="How to update the group list first (default: incremental)")
+    leave.add_argument('--keep-file',
+                       help="File with the IDs of groups to keep (default: each account's "
+                            "own keep list)")
+    leave.add_argument('--rules',
+                       help="Keep/leave rule file applied on top of the keep list (default: "
+                            "each account's keep_rules file, if any)")
+    leave.add_argument('--dry-run', action='store_true',
+                       help="Only list the groups that would be left")
+    leave.add_argument('--yes', action='store_true', help="Do not ask for confirmation")
+    leave.add_argument('--resume', action='store_true',
+                       help="Continue the interrupted leave job, skipping groups it already "
+                            "processed, instead of planning a new one")
+                            
+    import_keep = commands.add_parser(
+        'import-keep', help="Add the groups in a list of IDs, @usernames and t.me links to the keep list")
+    import_keep.add_argument('file', help="Text or CSV file with one or more entries per line")
+    import_keep.add_argument('--refresh', choices=['full', 'incremental', 'none'],
+                             default='incremental',
+                             help="How to update the group list first (default: incremental)")
+    import_keep.add_argument('--keep-file',
+                             help="Keep list to add to (default: each account's own keep list)")
+    import_keep.add_argument('--no-remote', action='store_true',
+                             help="Do not look up entries on Telegram; only match them against "
+                                  "the fetched groups and earlier lookups")
+                                  
+    log = commands.add_parser('log', help="Query the log of past leave requests")
+    log.add_argument('--status', choices=['Success', 'Retrying', 'Failed'])
+    log.add_argument('--error', metavar='CLASS', help="Error class, e.g. ChannelPrivateError")
+    log.add_argument('--group-id', type=int)
+    log.add_argument('--since', type=parse_time, metavar='WHEN',
+                     help="Only newer records: a date (YYYY-MM-DD) or an age such as 7d or 12h")
+    log.add_argument('--until', type=parse_time, metavar='WHEN', help="Only older records")
+    log.add_argument('--format', choices=['table', 'json'], default='table')
+    return parser.parse_args(argv)
+
+def parse_time(value):
+    """Parse a YYYY-MM-DD date or an age in days, hours or minutes (7d, 12h, 30m)"""
+    match = re.match(r'^(\d+)([dhm])$', value)
+    if match:
+        unit = {'d': 'days', 'h': 'hours', 'm': 'minutes'}[match.group(2)]
+        return datetime.now() - timedelta(**{unit: int(match.group(1))})
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid time {value!r}: use YYYY-MM-DD or an age like 7d")
+
+def select_accounts(args):
+    """Return the accounts to process"""
+    if args.all_accounts or args.account:
+        saved = {account.name: account for account in load_accounts()}
+        if args.all_accounts:
+            if not saved:
+                raise SystemExit("No saved accounts")
+            return list(saved.values())
+        unknown = [name for name in args.account if name not in saved]
+        if unknown:
+            raise SystemExit(f"Unknown account(s): {', '.join(unknown)}")
+        return [saved[name] for name in dict.fromkeys(args.account)]
+        
+    saved = load_credentials() or (None, None, None)
+    return [Account(DEFAULT_ACCOUNT,
+                    args.api_id or saved[0],
+                    args.api_hash or saved[1],
+                    args.phone or saved[2])]
+
+def is_resume(args):
+    return args.command == 'leave' and args.resume
+
+def needs_connection(args):
+    if args.command == 'log':
+        return False
+    if args.command == 'import-keep':
+        return args.refresh != 'none' or not args.no_remote
+    if is_resume(args):
+        return not args.dry_run
+    return args.refresh != 'none' or (args.command == 'leave' and not args.dry_run)
+
+class ProgressBoard:
+    """Prints status messages of several accounts with their combined progress"""
+    
+    def __init__(self, accounts, quiet=False):
+        self.quiet = quiet
+        self.multiple = len(accounts) > 1
+        self.progress = {account.name: 0 for account in accounts}
+        
+    def status(self, name, message):
+        if self.quiet:
+            return
+        if self.multiple:
+            overall = sum(self.progress.values()) // len(self.progress)
+            message = f"[{name}] {message} ({overall}% overall)"
+        print(message, file=sys.stderr)
+        
+    def set_progress(self, name, value):
+        self.progress[name] = value
+        
+    def callbacks(self, name):
+        return {
+            'on_status': lambda message: self.status(name, message),
+            'on_progress': lambda value: self.set_progress(name, value),
+        }
+
+def make_engine(account, board, metrics):
+    """Create the engine for an account, checking that it has credentials"""
+    if not all(account.credentials()):
+        raise SystemExit(f"Missing API credentials for account '{account.name}': pass "
+                         "--api-id, --api-hash and --phone or save them from the GUI first")
+    return TelegramEngine.for_account(account, metrics=metrics, **board.callbacks(account.name))
+
+async def load_groups(args, account, engine):
+    """Return the group list, refreshing it from Telegram first unless --refresh none"""
+    if args.refresh != 'none':
+        await engine.fetch_groups(incremental=args.refresh == 'incremental',
+                                  by_folder=not args.single_listing)
+    return GroupStore(DialogCache(account.cache_file).load())
+
+def write_groups(groups_by_account, output_format, output):
+    """Write group records as JSON or CSV, tagged with their account when there are several"""
+    with_account = len(groups_by_account) > 1
+    records = []
+    for account, groups in groups_by_account:
+        for group in groups:
+            record = group.to_dict()
+            if with_account:
+                record = {'account': account.name, **record}
+            records.append(record)
+            
+    if output_format == 'json':
+        json.dump(records, output, ensure_ascii=False, indent=2)
+        output.write("\n")
+    else:
+        fieldnames = (['account'] if with_account else []) + list(GroupRecord.__slots__)
+        writer = csv.DictWriter(output, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(records)
+
+async def run_fetch(args, targets):
+    group_lists = await asyncio.gather(*(load_groups(args, account, engine)
+                                         for account, engine in targets))
+    groups_by_account = [(account, groups) for (account, _), groups in zip(targets, group_lists)]
+    if args.output:
+        with open(args.output, 'w', newline='', encoding='utf-8') as f:
+            write_groups(groups_by_account, args.format, f)
+    else:
+        write_groups(groups_by_account, args.format, sys.stdout)
+    return 0
+
+def interrupted(targets):
+    """Return whether Ctrl+C cancelled the jobs of any account"""
+    return any(engine is not None and engine.cancelled for _, engine in targets)
+
+async def run_leave(args, targets):
+    group_lists = await asyncio.gather(*(load_groups(args, account, engine)
+                                         for account, engine in targets))
+    # A cancelled fetch leaves a partial group list, which must not be planned from
+    if interrupted(targets):
+        return 130
+    plans = []
+    overrides_by_account = {}
+    for (account, engine), groups in zip(targets, group_lists):
+        keep_store = KeepListStore(args.keep_file or account.keep_file)
+        rules_file = args.rules or account.rules_file
+        try:
+            policy = KeepPolicy.load(rules_file)
+        except RuleError as e:
+            raise SystemExit(f"{rules_file}: {e}")
+        groups_to_leave, overrides_by_account[account.name] = policy.apply(groups, keep_store)
+        plans.append((account, engine, groups, groups_to_leave))
+    total = sum(len(groups_to_leave) for _, _, _, groups_to_leave in plans)
+    
+    if not total:
+        print("No groups to leave.")
+        return 0
+    if args.dry_run:
+        for account, _, groups, groups_to_leave in plans:
+            print(f"Would leave {len(groups_to_leave)} of {len(groups)} groups"
+                  + (f" in account '{account.name}':" if len(plans) > 1 else ":"))
+            for group in groups_to_leave:
+                print(f"{group.id}\t{group.type.value}\t{group.name}")
+            overrides = overrides_by_account[account.name]
+            if overrides:
+                print(f"Keep rules override {len(overrides)} keep list entries:")
+                for group, keep, rule in overrides:
+                    print(f"{'keep' if keep else 'leave'}\t{group.id}\t{group.name}\t"
+                          f"(line {rule.line}: {rule.text})")
+        return 0
+    for account, _, _, _ in plans:
+        journal = LeaveJournal(account.journal_file)
+        job_id = journal.interrupted_job()
+        if job_id is not None:
+            print(f"Discarding the interrupted leave job of account '{account.name}' with "
+                  f"{len(journal.pending(job_id))} groups left; use --resume to finish it instead",
+                  file=sys.stderr)
+    if not args.yes:
+        if not sys.stdin.isatty():
+            print("Refusing to leave groups without confirmation; pass --yes", file=sys.stderr)
+            return 1
+        answer = input(f"Leave {total} groups across {len(plans)} account(s)? [y/N] ")
+        if answer.strip().lower() not in ('y', 'yes'):
+            return 1
+    if interrupted(targets):
+        return 130
+        
+    active = [plan for plan in plans if plan[3]]
+    outcomes = await asyncio.gather(*(engine.leave_groups(groups_to_leave)
+                                      for _, engine, _, groups_to_leave in active))
+    return report_results([account for account, _, _, _ in active], outcomes, len(plans) > 1)
+
+async def run_resume(args, targets):
+    """Continue the interrupted leave job of every selected account"""
+    jobs = []
+    for account, engine in targets:
+        journal = LeaveJournal(account.journal_file)
+        job_id = journal.interrupted_job()
+        if job_id is not None:
+            jobs.append((account, engine, journal.pending(job_id)))
+            
+    if not jobs:
+        print("No interrupted leave job to resume.")
+        return 0
+    if interrupted(targets):
+        return 130
+    if args.dry_run:
+        for account, _, pending in jobs:
+            print(f"Would resume leaving {len(pending)} groups"
+                  + (f" in account '{account.name}':" if len(targets) > 1 else ":"))
+            for group in pending:
+                print(f"{group.id}\t{group.type.value}\t{group.name}")
+        return 0
+        
+    outcomes = await asyncio.gather(*(engine.resume_leave_job() for _, engine, _ in jobs))
+    return report_results([account for account, _, _ in jobs], outcomes, len(targets) > 1)
+
+async def run_import_keep(args, targets):
+    """Resolve the entries of a keep list file and add the groups to each account's keep list"""
+    try:
+        with open(args.file, 'r', encoding='utf-8-sig') as f:
+            entries, invalid = parse_keep_list(f.read())
+    except OSError as e:
+        raise SystemExit(f"Cannot read {args.file}: {e}")
+    for text in invalid:
+        print(f"Not a group ID, @username or t.me link: {text}", file=sys.stderr)
+    if not entries:
+        print("No keep list entries to import.")
+        return 1
+        
+    group_lists = await asyncio.gather(*(load_groups(args, account, engine)
+                                         for account, engine in targets))
+    if interrupted(targets):
+        return 130
+        
+    async def import_for(account, engine, groups):
+        resolved, failed, remaining = resolve_keep_entries_locally(
+            entries, groups, ResolutionCache(account.resolve_cache_file))
+        if remaining and not args.no_remote:
+            found, not_found, _ = await engine.resolve_keep_entries(remaining)
+            resolved.update(found)
+            failed.update(not_found)
+            remaining = [entry for entry in remaining if entry not in found and entry not in not_found]
+        keep_store = KeepListStore(args.keep_file or account.keep_file)
+        before = len(keep_store)
+        keep_store.update(set(resolved.values()), True)
+        keep_store.save()
+        return resolved, failed, remaining, len(keep_store) - before
+        
+    outcomes = await asyncio.gather(*(import_for(account, engine, groups)
+                                      for (account, engine), groups in zip(targets, group_lists)))
+    any_unresolved = bool(invalid)
+    for (account, _), (resolved, failed, remaining, added) in zip(targets, outcomes):
+        prefix = f"[{account.name}] " if len(targets) > 1 else ""
+        print(f"{prefix}Resolved {len(resolved)} of {len(entries)} entries; "
+              f"added {added} groups to the keep list.")
+        for entry, reason in failed.items():
+            print(f"{prefix}Not resolved: {describe_entry(entry)}: {reason}", file=sys.stderr)
+        for entry in remaining:
+            print(f"{prefix}Not looked up: {describe_entry(entry)}", file=sys.stderr)
+        any_unresolved = any_unresolved or bool(failed or remaining)
+    return 1 if any_unresolved else 0
+
+def report_results(accounts, outcomes, multiple):
+    """Print a summary line per account; return the exit code"""
+    any_failed = False
+    for account, (results, message) in zip(accounts, outcomes):
+        failed = sum(1 for _, status, _ in results if status != "Success")
+        any_failed = any_failed or failed > 0
+        prefix = f"[{account.name}] " if multiple else ""
+        print(f"{prefix}Left {len(results) - failed} groups, {failed} failed. {message}")
+    return 1 if any_failed else 0
+
+def run_log(args, accounts):
+    """Print the logged leave requests matching the filters"""
+    records = []
+    for account in accounts:
+        records.extend(OperationLog(account.log_file).query(
+            status=args.status, error=args.error, group_id=args.group_id,
+            since=args.since, until=args.until))
+    records.sort(key=lambda record: record['time'])
+    
+    if args.format == 'json':
+        for record in records:
+            print(json.dumps(record, ensure_ascii=False))
+        return 0
+    for record in records:
+        account = f"{record['account']}\t" if len(accounts) > 1 else ""
+        print(f"{record['time']}\t{account}{record['group_id']}\t{record['status']}\t"
+              f"{record['error'] or '-'}\t{record['latency_ms']}ms\t{record['group_name']}")
+    return 0
+
+def check_files(args):
+    """Refuse files named on the command line that do not exist"""
+    keep_file = getattr(args, 'keep_file', None)
+    if keep_file and not os.path.exists(keep_file):
+        raise SystemExit(f"Keep file not found: {keep_file}")
+    rules = getattr(args, 'rules', None)
+    if rules and not os.path.exists(rules):
+        raise SystemExit(f"Rules file not found: {rules}")
+
+async def run(args):
+    check_files(args)
+    accounts = select_accounts(args)
+    if args.command == 'log':
+        return run_log(args, accounts)
+    board = ProgressBoard(accounts, quiet=args.quiet)
+    metrics = Metrics()
+    engines = [make_engine(account, board, metrics) if needs_connection(args) else None
+               for account in accounts]
+    targets = list(zip(accounts, engines))
+    watch_interrupt(engines, quiet=args.quiet)
+    try:
+        if args.command == 'fetch':
+            code = await run_fetch(args, targets)
+        elif args.command == 'import-keep':
+            code = await run_import_keep(args, targets)
+        elif is_resume(args):
+            code = await run_resume(args, targets)
+        else:
+            code = await run_leave(args, targets)
+        if interrupted(targets):
+            return 130
+        return code
+    finally:
+        await asyncio.gather(*(engine.disconnect() for engine in engines if engine is not None))
+        if args.metrics_file:
+            metrics.write_prometheus(args.metrics_file)
+
+def watch_interrupt(engines, quiet=False):
+    """Make the first Ctrl+C cancel the jobs cleanly; a second one aborts at once"""
+    loop = asyncio.get_event_loop()
+    
+    def cancel():
+        loop.remove_signal_handler(signal.SIGINT)
+        if not quiet:
+            print("Cancelling after the requests in flight; press Ctrl+C again to abort",
+                  file=sys.stderr)
+        for engine in engines:
+            if engine is not None:
+                engine.cancel()
+                
+    try:
+        loop.add_signal_handler(signal.SIGINT, cancel)
+    except NotImplementedError:
+        pass  # no loop signal handlers on Windows; Ctrl+C aborts immediately
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        return asyncio.run(run(args))
+    except AuthenticationError as e:
+        print(f"{e}. Please check your credentials.", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+
+if __name__ == "__main__":
+    sys.exit(main())
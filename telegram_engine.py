@@ -0,0 +1,1792 @@
+"""
+Telegram engine for the Group & Channel Manager
+
+Everything needed to fetch and leave groups without a GUI: the group records,
+the keep list and dialog cache, the leave scheduler and the TelegramEngine that
+drives a Telethon client. It must not import PyQt5, so the command line tool
+can use it on headless machines.
+"""
+
+import io
+import os
+import re
+import csv
+import gzip
+import json
+import queue
+import shutil
+import asyncio
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from enum import Enum
+from functools import lru_cache
+from types import SimpleNamespace
+
+# Configuration variables
+SESSION_NAME = "telegram_group_manager_session"
+GROUPS_TO_KEEP_FILE = "groups_to_keep.txt"
+KEEP_RULES_FILE = "keep_rules.txt"
+CONFIG_FILE = "telegram_config.txt"
+DIALOG_CACHE_FILE = f"{SESSION_NAME}.groups.db"
+RESOLVE_CACHE_FILE = f"{SESSION_NAME}.resolved.db"
+LEAVE_JOURNAL_FILE = f"{SESSION_NAME}.jobs.db"
+OPERATION_LOG_FILE = "leave_log.jsonl"
+
+# Additional named accounts; the default account keeps using CONFIG_FILE
+ACCOUNTS_FILE = "telegram_accounts.json"
+DEFAULT_ACCOUNT = "default"
+
+# Leave pipeline settings
+LEAVE_CONCURRENCY = 4        # leave requests in flight at once
+LEAVE_INITIAL_RATE = 1.0     # requests per second before any feedback
+LEAVE_MIN_RATE = 0.1
+LEAVE_MAX_RATE = 5.0
+LEAVE_RATE_INCREASE = 0.05   # added to the rate after each success
+LEAVE_MAX_RETRIES = 5        # flood-wait retries per group
+
+# Flood waits up to this many seconds are waited out and the request sent
+# again, except for the requests a LeaveScheduler paces, which get them raised
+FLOOD_SLEEP_THRESHOLD = 60
+
+# Keep list import: usernames and invite links not found among the fetched
+# groups are looked up on Telegram this many at a time, and lookups that failed
+# are cached for RESOLVE_FAILURE_TTL seconds before they are tried again
+RESOLVE_CONCURRENCY = 4
+RESOLVE_FAILURE_TTL = 24 * 3600
+
+# Number of dialogs read before fetched groups are reported in a batch
+FETCH_BATCH_SIZE = 200
+
+# An incremental fetch stops after this many dialogs in a row that are older
+# than the cache and unchanged in it; a dialog moved up by a draft alone must
+# not end it. Once the last full fetch is FULL_FETCH_INTERVAL seconds old, an
+# incremental fetch reads everything again, catching groups left elsewhere and
+# groups archived without a new message.
+INCREMENTAL_STOP_AFTER = 100
+FULL_FETCH_INTERVAL = 24 * 3600
+
+# Dialog folders read by separate concurrent iterators: the main list and the archive
+MAIN_FOLDER = 0
+ARCHIVE_FOLDER = 1
+DIALOG_FOLDERS = (MAIN_FOLDER, ARCHIVE_FOLDER)
+FOLDER_NAMES = {MAIN_FOLDER: "Main", ARCHIVE_FOLDER: "Archived"}
+
+# Leave progress is reported at most once per interval, with the throughput
+# measured over the last RATE_WINDOW seconds
+PROGRESS_INTERVAL = 0.2
+RATE_WINDOW = 10.0
+
+# Leave results are written to the job journal in batches: when this many are
+# buffered or when the oldest buffered result is this many seconds old
+JOURNAL_FLUSH_SIZE = 50
+JOURNAL_FLUSH_INTERVAL = 2.0
+
+# Operation log settings
+OPERATION_LOG_MAX_BYTES = 10 * 1024 * 1024  # rotate the log beyond this size
+OPERATION_LOG_BACKUPS = 5                   # rotated logs kept, gzip-compressed
+OPERATION_LOG_BATCH_SIZE = 100              # records per write by the writer thread
+
+# Request and UI timings are exported in the Prometheus text format to this file
+METRICS_FILE = "telegram_metrics.prom"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def load_credentials(path=CONFIG_FILE):
+    """Return the saved (api_id, api_hash, phone) or None if there are none"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        lines = f.readlines()
+    if len(lines) < 3:
+        return None
+    return tuple(line.strip() for line in lines[:3])
+
+def save_credentials(api_id, api_hash, phone, path=CONFIG_FILE):
+    """Save API credentials for future use"""
+    with open(path, 'w') as f:
+        f.write(f"{api_id}\n")
+        f.write(f"{api_hash}\n")
+        f.write(f"{phone}\n")
+
+@lru_cache(maxsize=None)
+def telethon_api():
+    """Import Telethon and the request types the engine sends
+    
+    Telethon and its TL schema take most of the start-up time, so they are only
+    imported when the first client is created, on the thread that connects.
+    """
+    from telethon import TelegramClient
+    from telethon.errors import FloodWaitError, RPCError
+    from telethon.tl.functions.channels import LeaveChannelRequest
+    from telethon.tl.functions.contacts import ResolveUsernameRequest
+    from telethon.tl.functions.messages import CheckChatInviteRequest, DeleteChatUserRequest
+    from telethon.tl.types import InputChannel, InputUserSelf
+    return SimpleNamespace(TelegramClient=TelegramClient, FloodWaitError=FloodWaitError,
+                           RPCError=RPCError, LeaveChannelRequest=LeaveChannelRequest,
+                           DeleteChatUserRequest=DeleteChatUserRequest,
+                           CheckChatInviteRequest=CheckChatInviteRequest,
+                           ResolveUsernameRequest=ResolveUsernameRequest,
+                           InputChannel=InputChannel, InputUserSelf=InputUserSelf)
+
+def is_flood_wait(error):
+    """Return whether a request failed with a flood wait"""
+    return isinstance(error, telethon_api().FloodWaitError)
+
+class AuthenticationError(Exception):
+    """Raised when Telegram does not authorize the session"""
+
+class Account:
+    """Credentials of one Telegram account and the files that belong to it
+    
+    The default account uses the original single-account file names, so
+    existing sessions, keep lists and caches keep working.
+    """
+    
+    NAME_PATTERN = re.compile(r'^[A-Za-z0-9_-]+$')
+    
+    def __init__(self, name, api_id, api_hash, phone):
+        if not self.NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid account name {name!r}: use letters, digits, '_' or '-'")
+        self.name = name
+        self.api_id = api_id
+        self.api_hash = api_hash
+        self.phone = phone
+        
+    @property
+    def is_default(self):
+        return self.name == DEFAULT_ACCOUNT
+        
+    @property
+    def session_name(self):
+        return SESSION_NAME if self.is_default else f"{SESSION_NAME}_{self.name}"
+        
+    @property
+    def keep_file(self):
+        return GROUPS_TO_KEEP_FILE if self.is_default else f"groups_to_keep_{self.name}.txt"
+        
+    @property
+    def cache_file(self):
+        return f"{self.session_name}.groups.db"
+        
+    @property
+    def resolve_cache_file(self):
+        return f"{self.session_name}.resolved.db"
+        
+    @property
+    def journal_file(self):
+        return f"{self.session_name}.jobs.db"
+        
+    @property
+    def rules_file(self):
+        return KEEP_RULES_FILE if self.is_default else f"keep_rules_{self.name}.txt"
+        
+    @property
+    def log_file(self):
+        return OPERATION_LOG_FILE if self.is_default else f"leave_log_{self.name}.jsonl"
+        
+    def credentials(self):
+        return (self.api_id, self.api_hash, self.phone)
+        
+    def to_dict(self):
+        return {'name': self.name, 'api_id': self.api_id, 'api_hash': self.api_hash,
+                'phone': self.phone}
+
+def load_accounts(path=ACCOUNTS_FILE):
+    """Return the default account (if credentials are saved) followed by the named accounts"""
+    accounts = []
+    credentials = load_credentials()
+    if credentials:
+        accounts.append(Account(DEFAULT_ACCOUNT, *credentials))
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for entry in json.load(f):
+                if entry['name'] != DEFAULT_ACCOUNT:
+                    accounts.append(Account(**entry))
+    return accounts
+
+def save_account(account, path=ACCOUNTS_FILE):
+    """Add or update an account; the default account is saved to CONFIG_FILE"""
+    if account.is_default:
+        save_credentials(*account.credentials())
+        return
+    entries = []
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = [entry for entry in json.load(f) if entry['name'] != account.name]
+    entries.append(account.to_dict())
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(entries, f, indent=2)
+
+class GroupType(Enum):
+    """Kind of dialog the app manages"""
+    GROUP = 'group'
+    SUPERGROUP = 'supergroup'
+    CHANNEL = 'channel'
+    
+    @property
+    def is_channel(self):
+        """Whether Telegram treats this dialog as a channel (left with LeaveChannelRequest)"""
+        return self is not GroupType.GROUP
+
+class GroupRecord:
+    """Compact record of a fetched group or channel"""
+    __slots__ = ('id', 'access_hash', 'name', 'type', 'top_message', 'last_date',
+                 'participants_count', 'unread_count', 'muted', 'folder', 'username')
+    
+    def __init__(self, id, name, type, access_hash=None, top_message=None, last_date=None,
+                 participants_count=None, unread_count=None, muted=None, folder=None,
+                 username=None):
+        self.id = int(id)
+        self.access_hash = access_hash
+        self.name = name
+        self.type = GroupType(type)
+        self.top_message = top_message
+        self.last_date = last_date
+        self.participants_count = participants_count
+        self.unread_count = unread_count
+        self.muted = None if muted is None else bool(muted)
+        self.folder = folder  # MAIN_FOLDER or ARCHIVE_FOLDER, None if fetched before folders
+        self.username = username  # public @username, without the @
+        
+    def __repr__(self):
+        return f"GroupRecord(id={self.id}, name={self.name!r}, type={self.type.value})"
+        
+    def to_dict(self):
+        """Return the record as a plain dict for JSON or CSV output"""
+        record = {field: getattr(self, field) for field in self.__slots__}
+        record['type'] = self.type.value
+        return record
+
+class GroupStore:
+    """Fetched groups indexed by ID"""
+    
+    def __init__(self, groups=()):
+        self._groups = {}
+        self.update(groups)
+        
+    def update(self, groups):
+        """Add new groups and replace known ones"""
+        for group in groups:
+            self._groups[group.id] = group
+            
+    def remove(self, group_ids):
+        """Drop the given groups"""
+        for group_id in group_ids:
+            self._groups.pop(group_id, None)
+            
+    def get(self, group_id):
+        return self._groups.get(group_id)
+        
+    def __contains__(self, group_id):
+        return group_id in self._groups
+        
+    def __iter__(self):
+        return iter(self._groups.values())
+        
+    def __len__(self):
+        return len(self._groups)
+        
+    def without(self, group_ids):
+        """Return the groups whose IDs are not in the given set"""
+        return [group for group_id, group in self._groups.items() if group_id not in group_ids]
+
+class AdaptiveRateLimiter:
+    """Token bucket whose refill rate adapts to the server's flood-wait responses
+    
+    The rate grows slowly with every successful request and is halved on each
+    flood wait, during which no tokens are handed out at all.
+    """
+    
+    def __init__(self, rate=LEAVE_INITIAL_RATE, min_rate=LEAVE_MIN_RATE,
+                 max_rate=LEAVE_MAX_RATE, increase=LEAVE_RATE_INCREASE, burst=1):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+        
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        
+    async def acquire(self):
+        """Wait until a request may be sent"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                
+    def on_success(self):
+        """Speed up after a request went through"""
+        self.rate = min(self.max_rate, self.rate + self.increase)
+        
+    def on_flood_wait(self, seconds):
+        """Slow down and hold all requests for the wait the server asked for"""
+        now = time.monotonic()
+        self.rate = max(self.min_rate, self.rate / 2)
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._tokens = 0
+        self._updated = now
+        
+    @property
+    def paused_for(self):
+        """Seconds left in the current flood wait"""
+        return max(0.0, self._paused_until - time.monotonic())
+
+class LeaveScheduler:
+    """Leaves groups concurrently, pacing the requests through an AdaptiveRateLimiter
+    
+    Groups hit by a flood wait are put back on the queue and retried once the
+    limiter lets requests through again. A run can be paused, which holds new
+    requests, or cancelled, which lets the requests already sent finish and
+    drops the rest of the queue. The keep list import paces its lookups with
+    it too, passing a lookup coroutine instead of a leave.
+    """
+    
+    def __init__(self, leave_group, concurrency=LEAVE_CONCURRENCY, rate_limiter=None,
+                 max_retries=LEAVE_MAX_RETRIES):
+        self.leave_group = leave_group  # coroutine function taking a group
+        self.concurrency = concurrency
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter()
+        self.max_retries = max_retries
+        self.cancelled = False
+        self._paused = False
+        self._unpaused = None         # events are created on the loop by run()
+        self._cancel_requested = None
+        self._sending = set()         # indexes of workers with a request in flight
+        
+    def cancel(self):
+        """Stop once the requests in flight have finished"""
+        self.cancelled = True
+        if self._cancel_requested is not None:
+            self._cancel_requested.set()
+            
+    def set_paused(self, paused):
+        """Hold new requests until unpaused; requests in flight still finish"""
+        self._paused = paused
+        if self._unpaused is not None:
+            if paused:
+                self._unpaused.clear()
+            else:
+                self._unpaused.set()
+        
+    async def run(self, groups, on_result, on_throttled=None, on_request=None):
+        """Leave all groups, calling on_result(group, status, message) as each finishes
+        
+        on_request(group, status, error, latency, attempt) is called after every
+        request, including those retried after a flood wait ("Retrying").
+        """
+        queue = asyncio.Queue()
+        for group in groups:
+            queue.put_nowait((group, 0))
+            
+        self._unpaused = asyncio.Event()
+        self.set_paused(self._paused)
+        self._cancel_requested = asyncio.Event()
+        if self.cancelled:
+            self._cancel_requested.set()
+            
+        workers = [asyncio.ensure_future(self._work(index, queue, on_result, on_throttled,
+                                                    on_request))
+                   for index in range(min(self.concurrency, len(groups)))]
+        finished = asyncio.ensure_future(queue.join())
+        cancelled = asyncio.ensure_future(self._cancel_requested.wait())
+        try:
+            await asyncio.wait([finished, cancelled], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            finished.cancel()
+            cancelled.cancel()
+            # Workers waiting for their turn stop now; those with a request in
+            # flight finish it first so its result is reported
+            for index, worker in enumerate(workers):
+                if index not in self._sending:
+                    worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            
+    async def _work(self, index, queue, on_result, on_throttled, on_request):
+        while not self.cancelled:
+            group, attempt = await queue.get()
+            try:
+                await self.rate_limiter.acquire()
+                await self._unpaused.wait()
+                if self.cancelled:
+                    return
+                self._sending.add(index)
+                started = time.monotonic()
+                error = None
+                try:
+                    await self.leave_group(group)
+                except Exception as e:
+                    error = e
+                finally:
+                    self._sending.discard(index)
+                    
+                flood_wait = error is not None and is_flood_wait(error)
+                if error is None:
+                    status = "Success"
+                elif flood_wait and attempt < self.max_retries:
+                    status = "Retrying"
+                else:
+                    status = "Failed"
+                if on_request:
+                    on_request(group, status, error, time.monotonic() - started, attempt)
+                    
+                if flood_wait:
+                    self.rate_limiter.on_flood_wait(error.seconds)
+                if status == "Retrying":
+                    if on_throttled:
+                        on_throttled(group, error.seconds)
+                    queue.put_nowait((group, attempt + 1))
+                elif status == "Failed":
+                    on_result(group, "Failed", str(error))
+                else:
+                    self.rate_limiter.on_success()
+                    on_result(group, "Success", "Left successfully")
+            finally:
+                queue.task_done()
+
+def format_duration(seconds):
+    """Format a duration as '1h 05m', '7m 27s' or '45s'"""
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds}s"
+
+class ProgressSnapshot:
+    """Counters of a bulk leave at one point in time"""
+    __slots__ = ('total', 'succeeded', 'failed', 'throttled', 'rate', 'eta', 'elapsed')
+    
+    def __init__(self, total, succeeded, failed, throttled, rate, eta, elapsed):
+        self.total = total
+        self.succeeded = succeeded
+        self.failed = failed
+        self.throttled = throttled
+        self.rate = rate          # groups per second over the recent window
+        self.eta = eta            # seconds left, or None while the rate is unknown
+        self.elapsed = elapsed
+        
+    @property
+    def done(self):
+        return self.succeeded + self.failed
+        
+    @property
+    def percent(self):
+        return int(self.done / self.total * 100) if self.total else 100
+        
+    def describe(self, action="Left", unit="groups"):
+        """Return a one-line status such as 'Left 120/2000 (3 failed) - 4.2 groups/s - 7m 27s left'"""
+        counts = [f"{self.failed} failed"] if self.failed else []
+        if self.throttled:
+            counts.append(f"{self.throttled} rate limited")
+        text = f"{action} {self.done}/{self.total}"
+        if counts:
+            text += f" ({', '.join(counts)})"
+        text += f" - {self.rate:.1f} {unit}/s"
+        if self.eta is not None and self.done < self.total:
+            text += f" - {format_duration(self.eta)} left"
+        return text
+
+class ProgressTracker:
+    """Collects the counters of a bulk leave or keep list lookup and reports
+    coalesced snapshots
+    
+    Results arrive once per group, but on_snapshot is called at most once per
+    interval (and once more on finish), so a fast job cannot flood the GUI
+    with cross-thread signals and repaints.
+    """
+    
+    def __init__(self, total, on_snapshot, interval=PROGRESS_INTERVAL, window=RATE_WINDOW):
+        self.total = total
+        self.on_snapshot = on_snapshot
+        self.interval = interval
+        self.window = window
+        self.succeeded = 0
+        self.failed = 0
+        self.throttled = 0
+        self._started = time.monotonic()
+        self._reported = 0.0
+        self._completions = deque()  # completion times within the rate window
+        
+    def add_result(self, status):
+        """Count a finished group"""
+        if status == "Success":
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        self._completions.append(time.monotonic())
+        self._report()
+        
+    def add_throttled(self):
+        """Count a request that has to be retried after a flood wait"""
+        self.throttled += 1
+        self._report()
+        
+    def finish(self):
+        """Report the final counters"""
+        self._report(force=True)
+        
+    def snapshot(self):
+        now = time.monotonic()
+        while self._completions and self._completions[0] < now - self.window:
+            self._completions.popleft()
+        elapsed = now - self._started
+        span = min(self.window, elapsed)
+        rate = len(self._completions) / span if span > 0 else 0.0
+        remaining = self.total - self.succeeded - self.failed
+        eta = remaining / rate if rate else None
+        return ProgressSnapshot(self.total, self.succeeded, self.failed, self.throttled,
+                                rate, eta, elapsed)
+        
+    def _report(self, force=False):
+        now = time.monotonic()
+        if force or now - self._reported >= self.interval:
+            self._reported = now
+            self.on_snapshot(self.snapshot())
+
+class DialogCache:
+    """SQLite cache of fetched group records, stored next to the session file"""
+    
+    COLUMNS = ('id', 'name', 'type', 'access_hash', 'top_message', 'last_date',
+               'participants_count', 'unread_count', 'muted', 'folder', 'username')
+    
+    # Columns added after the cache was introduced, created on older cache files
+    ADDED_COLUMNS = {'participants_count': 'INTEGER', 'unread_count': 'INTEGER',
+                     'muted': 'INTEGER', 'folder': 'INTEGER', 'username': 'TEXT'}
+    
+    def __init__(self, path=DIALOG_CACHE_FILE):
+        self.path = path
+        
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path)
+        try:
+            with db:
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS groups ("
+                    "id INTEGER PRIMARY KEY, access_hash INTEGER, name TEXT NOT NULL, "
+                    "type TEXT NOT NULL, top_message INTEGER, last_date INTEGER, "
+                    "participants_count INTEGER, unread_count INTEGER, muted INTEGER, "
+                    "folder INTEGER, username TEXT)"
+                )
+                db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)")
+                existing = {row[1] for row in db.execute("PRAGMA table_info(groups)")}
+                for column, column_type in self.ADDED_COLUMNS.items():
+                    if column not in existing:
+                        db.execute(f"ALTER TABLE groups ADD COLUMN {column} {column_type}")
+                yield db
+        finally:
+            db.close()
+            
+    def load(self):
+        """Return all cached groups, most recently active first"""
+        if not os.path.exists(self.path):
+            return []
+        with self._connect() as db:
+            rows = db.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM groups ORDER BY last_date DESC"
+            ).fetchall()
+        return [GroupRecord(*row) for row in rows]
+        
+    def high_water_mark(self):
+        """Return the newest cached last message date, or None if the cache is empty"""
+        if not os.path.exists(self.path):
+            return None
+        with self._connect() as db:
+            return db.execute("SELECT MAX(last_date) FROM groups").fetchone()[0]
+            
+    def last_full_fetch(self):
+        """Return when the cache was last replaced by a full fetch, or None"""
+        if not os.path.exists(self.path):
+            return None
+        with self._connect() as db:
+            row = db.execute("SELECT value FROM meta WHERE key = 'full_fetch'").fetchone()
+        return row[0] if row else None
+        
+    def versions(self):
+        """Return the top message and folder of every cached group, by ID"""
+        if not os.path.exists(self.path):
+            return {}
+        with self._connect() as db:
+            return {group_id: (top_message, folder) for group_id, top_message, folder
+                    in db.execute("SELECT id, top_message, folder FROM groups")}
+            
+    def update(self, groups):
+        """Insert new groups and overwrite changed ones"""
+        with self._connect() as db:
+            self._insert(db, groups)
+            
+    def replace(self, groups):
+        """Replace the whole cache with a fresh full fetch"""
+        with self._connect() as db:
+            db.execute("DELETE FROM groups")
+            self._insert(db, groups)
+            db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('full_fetch', ?)",
+                       (time.time(),))
+            
+    def remove(self, group_ids):
+        """Drop groups that were left"""
+        with self._connect() as db:
+            db.executemany("DELETE FROM groups WHERE id = ?",
+                           [(group_id,) for group_id in group_ids])
+            
+    def _insert(self, db, groups):
+        db.executemany(
+            f"INSERT OR REPLACE INTO groups ({', '.join(self.COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(self.COLUMNS))})",
+            [(group.id, group.name, group.type.value, group.access_hash,
+              group.top_message, group.last_date, group.participants_count,
+              group.unread_count, group.muted, group.folder, group.username)
+             for group in groups]
+        )
+
+class LeaveJournal:
+    """SQLite journal of leave jobs, so an interrupted job can be resumed
+    
+    A job records every group it is going to leave before the first request.
+    Results are buffered and written in batches; groups without a result when
+    the job was interrupted are left when it is resumed, the others are skipped.
+    """
+    
+    def __init__(self, path=LEAVE_JOURNAL_FILE, flush_size=JOURNAL_FLUSH_SIZE,
+                 flush_interval=JOURNAL_FLUSH_INTERVAL):
+        self.path = path
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._buffered_since = None
+        
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path)
+        try:
+            with db:
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS jobs ("
+                    "id INTEGER PRIMARY KEY AUTOINCREMENT, created INTEGER NOT NULL, "
+                    "finished INTEGER)"
+                )
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS job_groups ("
+                    "job_id INTEGER NOT NULL, id INTEGER NOT NULL, name TEXT NOT NULL, "
+                    "type TEXT NOT NULL, access_hash INTEGER, status TEXT, message TEXT, "
+                    "PRIMARY KEY (job_id, id))"
+                )
+                yield db
+        finally:
+            db.close()
+            
+    def start(self, groups):
+        """Record a new job with all its groups pending and return the job ID
+        
+        An interrupted job that was not resumed is closed, since the new job
+        is planned from the current group list anyway; finish() it first to
+        learn which of its groups were left.
+        """
+        now = int(time.time())
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET finished = ? WHERE finished IS NULL", (now,))
+            job_id = db.execute("INSERT INTO jobs (created) VALUES (?)", (now,)).lastrowid
+            db.executemany(
+                "INSERT OR REPLACE INTO job_groups (job_id, id, name, type, access_hash) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(job_id, group.id, group.name, group.type.value, group.access_hash)
+                 for group in groups]
+            )
+        return job_id
+        
+    def interrupted_job(self):
+        """Return the ID of the latest job that did not finish, or None"""
+        if not os.path.exists(self.path):
+            return None
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT id FROM jobs WHERE finished IS NULL ORDER BY id DESC LIMIT 1"
+            ).fetchone()
+        return row[0] if row else None
+        
+    def pending(self, job_id):
+        """Return the groups of a job that have no recorded result yet"""
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT id, name, type, access_hash FROM job_groups "
+                "WHERE job_id = ? AND status IS NULL", (job_id,)
+            ).fetchall()
+        return [GroupRecord(*row) for row in rows]
+        
+    def record(self, job_id, group, status, message):
+        """Buffer a result, writing the buffer once it is full or old enough"""
+        now = time.monotonic()
+        if not self._buffer:
+            self._buffered_since = now
+        self._buffer.append((status, message, job_id, group.id))
+        if (len(self._buffer) >= self.flush_size
+                or now - self._buffered_since >= self.flush_interval):
+            self.flush()
+            
+    def flush(self):
+        """Write the buffered results in one transaction"""
+        if not self._buffer:
+            return
+        with self._connect() as db:
+            db.executemany(
+                "UPDATE job_groups SET status = ?, message = ? WHERE job_id = ? AND id = ?",
+                self._buffer
+            )
+        self._buffer = []
+        
+    def finish(self, job_id):
+        """Mark a job finished and return the IDs of the groups it left"""
+        self.flush()
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET finished = ? WHERE id = ?", (int(time.time()), job_id))
+            rows = db.execute(
+                "SELECT id FROM job_groups WHERE job_id = ? AND status = 'Success'", (job_id,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+class OperationLog:
+    """JSON Lines log of every leave request, written by a background thread
+    
+    Records are queued from the event loop and appended in batches, so logging
+    never holds up a request. Once the file grows past max_bytes it is rotated
+    to path.1.gz, path.2.gz, ... and only the newest backups are kept.
+    """
+    
+    def __init__(self, path=OPERATION_LOG_FILE, max_bytes=OPERATION_LOG_MAX_BYTES,
+                 backups=OPERATION_LOG_BACKUPS, batch_size=OPERATION_LOG_BATCH_SIZE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        
+    def write(self, **record):
+        """Queue a record for writing, stamped with the current time"""
+        record.setdefault('time', datetime.now().isoformat(timespec='seconds'))
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="operation-log",
+                                                daemon=True)
+                self._thread.start()
+        self._queue.put(record)
+        
+    def flush(self):
+        """Block until every queued record has been written"""
+        self._queue.join()
+        
+    def close(self):
+        """Write the queued records and stop the writer thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join()
+            
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            records = [record for record in batch if record is not None]
+            try:
+                if records:
+                    self._append(records)
+            except Exception as e:
+                print(f"Error writing operation log: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if len(records) < len(batch):
+                return
+                
+    def _append(self, records):
+        data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+        if os.path.exists(self.path) and os.path.getsize(self.path) + len(data) > self.max_bytes:
+            self._rotate()
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(data)
+            
+    def _rotate(self):
+        """Compress the current log into the first backup, shifting the older ones"""
+        if self.backups:
+            for index in range(self.backups - 1, 0, -1):
+                older = f"{self.path}.{index}.gz"
+                if os.path.exists(older):
+                    os.replace(older, f"{self.path}.{index + 1}.gz")
+            with open(self.path, 'rb') as src, gzip.open(f"{self.path}.1.gz", 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+        os.remove(self.path)
+        
+    def files(self):
+        """Return the existing log files, oldest first"""
+        paths = [f"{self.path}.{index}.gz" for index in range(self.backups, 0, -1)]
+        paths.append(self.path)
+        return [path for path in paths if os.path.exists(path)]
+        
+    def query(self, status=None, error=None, group_id=None, since=None, until=None):
+        """Yield the logged records matching every given filter, oldest first
+        
+        For example, the groups that failed with ChannelPrivateError last week:
+        query(error='ChannelPrivateError', since=datetime.now() - timedelta(days=7))
+        """
+        self.flush()
+        since = since.isoformat(timespec='seconds') if since else None
+        until = until.isoformat(timespec='seconds') if until else None
+        for path in self.files():
+            opener = gzip.open if path.endswith('.gz') else open
+            with opener(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # line cut short by a crash
+                    if ((since and record['time'] < since)
+                            or (until and record['time'] >= until)
+                            or (status and record['status'] != status)
+                            or (error and record['error'] != error)
+                            or (group_id is not None and record['group_id'] != group_id)):
+                        continue
+                    yield record
+
+class Histogram:
+    """Cumulative latency histogram over fixed buckets, as Prometheus expects"""
+    
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        
+    def observe(self, seconds):
+        for index, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[index] += 1
+                break
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+        
+    def quantile(self, q):
+        """Return the upper bound of the bucket holding the q-quantile, or max beyond the last"""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+        
+    def cumulative(self):
+        """Return (upper bound, observations up to it) for each bucket"""
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield bound, total
+
+class RequestStats:
+    """Counters and latency histogram of one type of Telegram request"""
+    
+    def __init__(self):
+        self.latency = Histogram()
+        self.errors = 0
+        self.flood_waits = 0
+        self.retries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+class Metrics:
+    """Request latencies, retries, flood waits and bytes per account and request type,
+    plus the duration of UI phases
+    
+    Shared by the worker threads and the GUI thread, so every update holds a lock.
+    """
+    
+    def __init__(self):
+        self.requests = {}  # (account, request type) -> RequestStats
+        self.phases = {}    # phase name -> Histogram
+        self._lock = threading.Lock()
+        
+    def observe_request(self, account, operation, seconds, error=None, sent=0, received=0):
+        with self._lock:
+            stats = self.requests.get((account, operation))
+            if stats is None:
+                stats = self.requests[(account, operation)] = RequestStats()
+            stats.latency.observe(seconds)
+            stats.bytes_sent += sent
+            stats.bytes_received += received
+            if error is not None:
+                stats.errors += 1
+                if is_flood_wait(error):
+                    stats.flood_waits += 1
+                    
+    def observe_retry(self, account, operation):
+        with self._lock:
+            stats = self.requests.get((account, operation))
+            if stats is None:
+                stats = self.requests[(account, operation)] = RequestStats()
+            stats.retries += 1
+            
+    def observe_phase(self, phase, seconds):
+        with self._lock:
+            histogram = self.phases.get(phase)
+            if histogram is None:
+                histogram = self.phases[phase] = Histogram()
+            histogram.observe(seconds)
+            
+    @contextmanager
+    def timed(self, phase):
+        """Time the body of a with statement as one run of a UI phase"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_phase(phase, time.perf_counter() - start)
+            
+    def describe(self):
+        """Return a plain text table of the requests and UI phases"""
+        lines = [f"{'Request':<34}{'Count':>7}{'Mean ms':>9}{'p95 ms':>9}{'Max ms':>9}"
+                 f"{'Errors':>8}{'Floods':>8}{'Retries':>8}{'KB out':>9}{'KB in':>9}"]
+        with self._lock:
+            for (account, operation), stats in sorted(self.requests.items()):
+                latency = stats.latency
+                mean = latency.sum / latency.count if latency.count else 0
+                lines.append(f"{account + ' ' + operation:<34}{latency.count:>7}"
+                             f"{mean * 1000:>9.1f}{latency.quantile(0.95) * 1000:>9.1f}"
+                             f"{latency.max * 1000:>9.1f}{stats.errors:>8}{stats.flood_waits:>8}"
+                             f"{stats.retries:>8}{stats.bytes_sent / 1024:>9.1f}"
+                             f"{stats.bytes_received / 1024:>9.1f}")
+            lines.append("")
+            lines.append(f"{'UI phase':<34}{'Count':>7}{'Mean ms':>9}{'p95 ms':>9}{'Max ms':>9}")
+            for phase, histogram in sorted(self.phases.items()):
+                mean = histogram.sum / histogram.count if histogram.count else 0
+                lines.append(f"{phase:<34}{histogram.count:>7}{mean * 1000:>9.1f}"
+                             f"{histogram.quantile(0.95) * 1000:>9.1f}{histogram.max * 1000:>9.1f}")
+        return "\n".join(lines)
+        
+    def to_prometheus(self):
+        """Return the metrics in the Prometheus text exposition format"""
+        out = []
+        
+        def histogram_lines(name, labels, histogram):
+            for bound, count in histogram.cumulative():
+                out.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+            out.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            out.append(f'{name}_sum{{{labels}}} {histogram.sum:.6f}')
+            out.append(f'{name}_count{{{labels}}} {histogram.count}')
+            
+        with self._lock:
+            requests = sorted(self.requests.items())
+            out.append("# HELP telegram_request_duration_seconds Latency of Telegram requests")
+            out.append("# TYPE telegram_request_duration_seconds histogram")
+            for (account, operation), stats in requests:
+                histogram_lines("telegram_request_duration_seconds",
+                                f'account="{account}",request="{operation}"', stats.latency)
+            for field, description in (("errors", "Failed Telegram requests"),
+                                       ("flood_waits", "Telegram requests refused with a flood wait"),
+                                       ("retries", "Telegram requests retried after a flood wait"),
+                                       ("bytes_sent", "Serialized size of the requests sent"),
+                                       ("bytes_received", "Serialized size of the responses received")):
+                name = f"telegram_request_{field}_total"
+                out.append(f"# HELP {name} {description}")
+                out.append(f"# TYPE {name} counter")
+                for (account, operation), stats in requests:
+                    out.append(f'{name}{{account="{account}",request="{operation}"}} '
+                               f'{getattr(stats, field)}')
+            out.append("# HELP telegram_ui_phase_duration_seconds Duration of GUI phases")
+            out.append("# TYPE telegram_ui_phase_duration_seconds histogram")
+            for phase, histogram in sorted(self.phases.items()):
+                histogram_lines("telegram_ui_phase_duration_seconds", f'phase="{phase}"', histogram)
+        return "\n".join(out) + "\n"
+        
+    def write_prometheus(self, path=METRICS_FILE):
+        """Write the Prometheus text file, replacing it atomically so scrapers never read half"""
+        text = self.to_prometheus()
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(prefix='.telegram_metrics.', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+def tl_size(value):
+    """Return the serialized size of a Telegram object, or 0 for anything else"""
+    if hasattr(value, '_bytes'):
+        return len(bytes(value))
+    return 0
+
+class KeepListStore:
+    """In-memory set of integer group IDs to keep, backed by GROUPS_TO_KEEP_FILE"""
+    
+    def __init__(self, path=GROUPS_TO_KEEP_FILE):
+        self.path = path
+        self._ids = set()
+        self._dirty = False
+        self.load()
+        
+    def load(self):
+        """Read the keep list from disk, replacing the in-memory set"""
+        self._ids = set()
+        self._dirty = False
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            self._ids.add(int(line))
+                        except ValueError:
+                            print(f"Ignoring invalid group ID in {self.path}: {line}")
+            except Exception as e:
+                print(f"Error loading groups to keep: {e}")
+                
+    def __contains__(self, group_id):
+        return group_id in self._ids
+        
+    def __iter__(self):
+        return iter(self._ids)
+        
+    def __len__(self):
+        return len(self._ids)
+        
+    @property
+    def dirty(self):
+        """Whether there are changes not yet written to disk"""
+        return self._dirty
+        
+    def update(self, group_ids, keep):
+        """Mark the given groups as kept or not kept"""
+        group_ids = {int(group_id) for group_id in group_ids}
+        if keep:
+            changed = not group_ids <= self._ids
+            self._ids |= group_ids
+        else:
+            changed = not self._ids.isdisjoint(group_ids)
+            self._ids -= group_ids
+        self._dirty = self._dirty or changed
+        return changed
+        
+    def save(self):
+        """Write the keep list if it changed, replacing the file atomically"""
+        if not self._dirty:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix='.groups_to_keep.', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                for group_id in sorted(self._ids):
+                    f.write(f"{group_id}\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        self._dirty = False
+
+USERNAME_PATTERN = re.compile(r'^([A-Za-z][A-Za-z0-9_]{3,31})$')
+LINK_PATTERN = re.compile(r'^(?:https?://)?(?:www\.)?(?:t\.me|telegram\.me|telegram\.dog)/([^?#]+)',
+                          re.IGNORECASE)
+RESOLVE_LINK_PATTERN = re.compile(r'^tg://resolve\?domain=(\w+)', re.IGNORECASE)
+
+# CSV columns read when a keep list has a header row; other columns are ignored
+KEEP_LIST_COLUMNS = ('id', 'group_id', 'username', 'link', 'url', 'entry')
+
+def parse_keep_entry(text):
+    """Parse one keep list entry into ('id', int), ('username', str) or ('invite', str)
+    
+    Accepts group IDs (also the -100... form of the Bot API), usernames with or
+    without @, t.me/username, t.me/c/ID and t.me/+HASH or t.me/joinchat/HASH
+    invite links. Returns None if the text is none of these.
+    """
+    text = text.strip().strip('"\'')
+    if re.match(r'^-?\d+$', text):
+        number = int(text)
+        if number < 0:
+            # Bot API style marked IDs: -100<channel ID> or -<chat ID>
+            digits = str(-number)
+            number = int(digits[3:]) if digits.startswith('100') and len(digits) > 3 else -number
+        return ('id', number)
+    match = USERNAME_PATTERN.match(text[1:] if text.startswith('@') else text)
+    if match:
+        return ('username', match.group(1).lower())
+    if text.startswith('@'):
+        return None
+    match = RESOLVE_LINK_PATTERN.match(text)
+    if match:
+        return ('username', match.group(1).lower())
+    match = LINK_PATTERN.match(text)
+    if not match:
+        return None
+    parts = [part for part in match.group(1).split('/') if part]
+    if not parts:
+        return None
+    if parts[0] == 'c' and len(parts) > 1 and parts[1].isdigit():
+        return ('id', int(parts[1]))
+    if parts[0] == 'joinchat' and len(parts) > 1:
+        return ('invite', parts[1])
+    if parts[0].startswith('+') and not parts[0][1:].isdigit():
+        return ('invite', parts[0][1:])  # t.me/+<digits> is a phone number, not an invite
+    if parts[0] == 's' and len(parts) > 1:
+        parts = parts[1:]
+    match = USERNAME_PATTERN.match(parts[0])
+    return ('username', match.group(1).lower()) if match else None
+
+def parse_keep_list(text):
+    """Parse a keep list in text or CSV form
+    
+    Entries may be one per line or several per line separated by commas or
+    spaces; lines starting with # are comments. If the first row is a CSV
+    header naming one of KEEP_LIST_COLUMNS, only those columns are read, so
+    the CSV written by telegram_cli.py fetch can be imported as is. Returns the
+    distinct entries in file order and the texts that are not valid entries.
+    """
+    rows = [row for row in csv.reader(io.StringIO(text))
+            if row and not row[0].lstrip().startswith('#')]
+    columns = None
+    if rows:
+        header = [cell.strip().lower() for cell in rows[0]]
+        columns = [index for index, cell in enumerate(header) if cell in KEEP_LIST_COLUMNS]
+        if columns:
+            rows = rows[1:]
+        else:
+            columns = None
+    entries = {}
+    invalid = []
+    for row in rows:
+        cells = row if columns is None else [row[index] for index in columns if index < len(row)]
+        for cell in cells:
+            for token in cell.split():
+                entry = parse_keep_entry(token)
+                if entry is None:
+                    invalid.append(token)
+                else:
+                    entries.setdefault(entry, None)
+    return list(entries), invalid
+
+def describe_entry(entry):
+    """Return a keep list entry the way it is usually written"""
+    kind, value = entry
+    if kind == 'username':
+        return f"@{value}"
+    if kind == 'invite':
+        return f"t.me/+{value}"
+    return str(value)
+
+class ResolutionCache:
+    """SQLite cache of keep list entries looked up on Telegram, so each is resolved once
+    
+    Failed lookups are cached too, but tried again once they are older than
+    failure_ttl seconds.
+    """
+    
+    def __init__(self, path=RESOLVE_CACHE_FILE, failure_ttl=RESOLVE_FAILURE_TTL):
+        self.path = path
+        self.failure_ttl = failure_ttl
+        
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path)
+        try:
+            with db:
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS resolutions ("
+                    "kind TEXT NOT NULL, value TEXT NOT NULL, group_id INTEGER, reason TEXT, "
+                    "resolved INTEGER NOT NULL, PRIMARY KEY (kind, value))"
+                )
+                yield db
+        finally:
+            db.close()
+            
+    def lookup(self):
+        """Return the cached resolutions {entry: group ID} and recent failures {entry: reason}"""
+        if not os.path.exists(self.path):
+            return {}, {}
+        with self._connect() as db:
+            rows = db.execute("SELECT kind, value, group_id, reason, resolved FROM resolutions")
+            resolved = {}
+            failed = {}
+            retry_before = time.time() - self.failure_ttl
+            for kind, value, group_id, reason, resolved_at in rows:
+                if group_id is not None:
+                    resolved[(kind, value)] = group_id
+                elif resolved_at >= retry_before:
+                    failed[(kind, value)] = reason
+        return resolved, failed
+        
+    def store(self, resolved, failed):
+        """Record new resolutions and failures"""
+        now = int(time.time())
+        with self._connect() as db:
+            db.executemany(
+                "INSERT OR REPLACE INTO resolutions (kind, value, group_id, reason, resolved) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(kind, str(value), group_id, None, now)
+                 for (kind, value), group_id in resolved.items()]
+                + [(kind, str(value), None, reason, now)
+                   for (kind, value), reason in failed.items()]
+            )
+
+def resolve_keep_entries_locally(entries, groups, cache=None):
+    """Resolve keep list entries without contacting Telegram
+    
+    IDs resolve to themselves and usernames are matched against the fetched
+    groups; the rest is looked up in the resolution cache. Returns the resolved
+    entries {entry: group ID}, the cached failures {entry: reason} and the
+    entries still to be looked up on Telegram.
+    """
+    by_username = {group.username.lower(): group.id for group in groups if group.username}
+    cached, cached_failures = cache.lookup() if cache is not None else ({}, {})
+    resolved = {}
+    failed = {}
+    remaining = []
+    for entry in entries:
+        kind, value = entry
+        if kind == 'id':
+            resolved[entry] = value
+        elif kind == 'username' and value in by_username:
+            resolved[entry] = by_username[value]
+        elif entry in cached:
+            resolved[entry] = cached[entry]
+        elif entry in cached_failures:
+            failed[entry] = cached_failures[entry]
+        else:
+            remaining.append(entry)
+    return resolved, failed, remaining
+
+class TelegramEngine:
+    """Fetch and leave groups over one long-lived Telegram client
+    
+    Progress is reported through optional callbacks so the same code can drive
+    the GUI worker thread and the command line tool. Each engine has its own
+    client and rate limiter, so engines for several accounts can run side by
+    side on one event loop.
+    """
+    
+    # Class of the clients created; None for Telethon's TelegramClient
+    client_class = None
+    
+    def __init__(self, api_id, api_hash, phone_number, session_name=SESSION_NAME,
+                 dialog_cache=None, on_status=None, on_progress=None, on_batch=None,
+                 name=DEFAULT_ACCOUNT, journal=None, operation_log=None, on_snapshot=None,
+                 metrics=None, resolve_cache=None):
+        self.api_id = api_id
+        self.api_hash = api_hash
+        self.phone_number = phone_number
+        self.session_name = session_name
+        self.dialog_cache = dialog_cache or DialogCache()
+        self.journal = journal or LeaveJournal()
+        self.operation_log = operation_log or OperationLog()
+        self.metrics = metrics or Metrics()
+        self.resolve_cache = resolve_cache or ResolutionCache()
+        self.on_status = on_status
+        self.on_progress = on_progress
+        self.on_batch = on_batch
+        self.on_snapshot = on_snapshot  # receives ProgressSnapshot objects during leaves
+        self.name = name
+        self.client = None
+        self.rate_limiter = None  # created on the event loop at the first leave
+        self.resolve_rate_limiter = None  # likewise, at the first keep list lookup
+        self.cancelled = False    # set by cancel(); cleared by the caller between jobs
+        self._paused = False
+        self._scheduler = None
+        
+    @classmethod
+    def for_account(cls, account, **callbacks):
+        """Create an engine using the account's session, caches, journal and log"""
+        return cls(account.api_id, account.api_hash, account.phone,
+                   session_name=account.session_name,
+                   dialog_cache=DialogCache(account.cache_file),
+                   journal=LeaveJournal(account.journal_file),
+                   operation_log=OperationLog(account.log_file),
+                   resolve_cache=ResolutionCache(account.resolve_cache_file),
+                   name=account.name, **callbacks)
+        
+    def credentials(self):
+        """Return the credentials this engine connects with"""
+        return (self.api_id, self.api_hash, self.phone_number)
+        
+    def cancel(self):
+        """Stop the running job, letting requests already sent finish
+        
+        Jobs do not clear the flag when they start, so a cancel that comes
+        before a job also stops it; whoever runs the jobs resets cancelled
+        between them. Must be called on the engine's event loop.
+        """
+        self.cancelled = True
+        if self._scheduler is not None:
+            self._scheduler.cancel()
+            
+    def set_paused(self, paused):
+        """Hold or release the requests of the running leave job
+        
+        Must be called on the engine's event loop.
+        """
+        self._paused = paused
+        if self._scheduler is not None:
+            self._scheduler.set_paused(paused)
+        if paused:
+            self.status("Paused")
+            
+    def status(self, message):
+        if self.on_status:
+            self.on_status(message)
+            
+    def progress(self, value):
+        if self.on_progress:
+            self.on_progress(value)
+            
+    async def create_client(self):
+        """Create and connect the Telegram client"""
+        self.status("Connecting to Telegram...")
+        client = self.new_client()
+        start = time.perf_counter()
+        await client.start(phone=self.phone_number)
+        self.metrics.observe_request(self.name, 'start', time.perf_counter() - start)
+        
+        if not await client.is_user_authorized():
+            await client.disconnect()
+            raise AuthenticationError("Authentication failed")
+            
+        self.status("Connected to Telegram successfully")
+        return client
+        
+    def new_client(self):
+        """Create the Telegram client, not yet connected
+        
+        Telethon compares the flood waits Telegram returns with the client's
+        flood_sleep_threshold only, so the client gets 0 and raises every one;
+        the engine waits them out itself in instrument().
+        """
+        client_class = self.client_class or telethon_api().TelegramClient
+        client = client_class(self.session_name, self.api_id, self.api_hash,
+                              flood_sleep_threshold=0)
+        self.instrument(client)
+        return client
+        
+    def instrument(self, client):
+        """Time every request the client sends, by request type, and wait out flood waits
+        
+        Telethon sends all requests, including those made by iter_dialogs and
+        get_entity, through the client's _call method, so wrapping it there
+        sees each one once. A flood wait up to the call's flood_sleep_threshold,
+        FLOOD_SLEEP_THRESHOLD by default, is slept through and the request sent
+        again; a longer one is raised. Telethon itself never sleeps, so every
+        flood wait and every retry shows up in the metrics.
+        """
+        call = getattr(client, '_call', None)
+        if call is None:
+            return
+        metrics = self.metrics
+        account = self.name
+        
+        async def timed_call(sender, request, ordered=False, flood_sleep_threshold=None):
+            if flood_sleep_threshold is None:
+                flood_sleep_threshold = FLOOD_SLEEP_THRESHOLD
+            operation = type(request).__name__
+            sent = tl_size(request)
+            while True:
+                start = time.perf_counter()
+                try:
+                    # Telethon must not sleep before sending either
+                    result = await call(sender, request, ordered=ordered, flood_sleep_threshold=0)
+                except Exception as e:
+                    metrics.observe_request(account, operation, time.perf_counter() - start,
+                                            error=e, sent=sent)
+                    if not is_flood_wait(e) or e.seconds > flood_sleep_threshold:
+                        raise
+                    await asyncio.sleep(e.seconds)
+                    metrics.observe_retry(account, operation)
+                    continue
+                metrics.observe_request(account, operation, time.perf_counter() - start,
+                                        sent=sent, received=tl_size(result))
+                return result
+                
+        client._call = timed_call
+        
+    async def send_scheduled(self, client, request):
+        """Send a request paced by a LeaveScheduler, raising its flood waits
+        
+        The scheduler waits out flood waits itself and keeps the other requests
+        going meanwhile. TelegramClient.__call__ drops flood_sleep_threshold,
+        so the request goes through _call.
+        """
+        return await client._call(client._sender, request, flood_sleep_threshold=0)
+        
+    async def ensure_client(self):
+        """Return the connected client, connecting or reconnecting as needed"""
+        if self.client is None:
+            self.client = await self.create_client()
+        elif not self.client.is_connected():
+            self.status("Reconnecting to Telegram...")
+            await self.client.connect()
+        return self.client
+        
+    async def disconnect(self):
+        """Disconnect the client if one was created and finish writing the log"""
+        if self.client is not None:
+            await self.client.disconnect()
+            self.client = None
+        self.operation_log.close()
+            
+    @staticmethod
+    def group_from_dialog(dialog):
+        """Return the group record for a dialog, or None if it is not a group or channel"""
+        entity = dialog.entity
+        if hasattr(entity, 'megagroup') and entity.megagroup:
+            group_type = GroupType.SUPERGROUP
+        elif getattr(dialog, 'is_group', False):
+            # A basic group's Chat entity has no flag of its own; Telethon tells it apart
+            group_type = GroupType.GROUP
+        elif hasattr(entity, 'broadcast') and entity.broadcast:
+            group_type = GroupType.CHANNEL
+        else:
+            return None
+            
+        # Keep the access hash so leaving needs no entity lookup, the activity
+        # markers used for incremental refreshes, and the metadata the dialog
+        # listing already includes, so deciding what to leave needs no requests
+        return GroupRecord(
+            entity.id,
+            dialog.name,
+            group_type,
+            access_hash=getattr(entity, 'access_hash', None),
+            top_message=dialog.dialog.top_message,
+            last_date=int(dialog.date.timestamp()) if dialog.date else None,
+            participants_count=getattr(entity, 'participants_count', None),
+            unread_count=getattr(dialog, 'unread_count', None),
+            muted=TelegramEngine.is_muted(dialog),
+            folder=getattr(dialog, 'folder_id', None) or MAIN_FOLDER,
+            username=getattr(entity, 'username', None)
+        )
+        
+    @staticmethod
+    def is_muted(dialog):
+        """Return whether notifications of a dialog are muted, or None if unknown"""
+        settings = getattr(dialog.dialog, 'notify_settings', None)
+        if settings is None:
+            return None
+        mute_until = getattr(settings, 'mute_until', None)
+        if mute_until is None:
+            return False
+        if isinstance(mute_until, datetime):
+            mute_until = mute_until.timestamp()
+        return mute_until > time.time()
+        
+    async def fetch_groups(self, incremental=False, by_folder=True):
+        """Stream groups from Telegram, reporting them in batches
+        
+        An incremental fetch stops after INCREMENTAL_STOP_AFTER unpinned dialogs
+        in a row that are older than the newest cached group and whose top
+        message and folder match the cache, and merges the changes into the
+        dialog cache; a full fetch replaces the cache. Only a full fetch drops
+        groups left elsewhere and moves groups archived without a new message,
+        so an incremental fetch is a full one once the last full fetch is
+        FULL_FETCH_INTERVAL old. With by_folder the main list and the archive
+        are paged through by separate iterators running concurrently, so a fetch
+        takes about as long as the larger folder rather than both; otherwise one
+        iterator lists every dialog. Returns the fetched groups and a summary.
+        """
+        client = await self.ensure_client()
+        high_water = None
+        if incremental:
+            last_full_fetch = self.dialog_cache.last_full_fetch()
+            if last_full_fetch is not None and time.time() - last_full_fetch < FULL_FETCH_INTERVAL:
+                high_water = self.dialog_cache.high_water_mark()
+        incremental = high_water is not None
+        versions = self.dialog_cache.versions() if incremental else {}
+        self.status("Refreshing your groups..." if incremental else "Fetching your groups...")
+        self.progress(0)
+        
+        if by_folder:
+            iterators = [client.iter_dialogs(folder=folder) for folder in DIALOG_FOLDERS]
+        else:
+            iterators = [client.iter_dialogs()]
+        fetched = []
+        seen_peers = set()  # marked peer IDs, so a dialog listed twice is kept once
+        found = 0
+        batch = []
+        
+        def report_batch():
+            nonlocal found, batch
+            found += len(batch)
+            if batch and self.on_batch:
+                self.on_batch(batch)
+            batch = []
+            
+        async def read(dialogs):
+            unchanged = 0  # old dialogs in a row that match the cache
+            async for dialog in dialogs:
+                if self.cancelled:
+                    break
+                    
+                group = self.group_from_dialog(dialog)
+                # Dialogs come newest first, so after a run of unchanged ones the
+                # rest is unchanged since the cache too
+                if incremental and not dialog.pinned:
+                    if (dialog.date and dialog.date.timestamp() < high_water
+                            and (group is None or versions.get(group.id)
+                                 == (group.top_message, group.folder))):
+                        unchanged += 1
+                        if unchanged >= INCREMENTAL_STOP_AFTER:
+                            break
+                    else:
+                        unchanged = 0
+                        
+                if dialog.id in seen_peers:
+                    continue
+                seen_peers.add(dialog.id)
+                if group:
+                    batch.append(group)
+                    fetched.append(group)
+                    
+                if len(seen_peers) % FETCH_BATCH_SIZE == 0:
+                    report_batch()
+                    total = sum(iterator.total or 0 for iterator in iterators)
+                    if total:
+                        self.progress(min(99, int((len(seen_peers) / total) * 100)))
+                    self.status(f"Fetching your groups... {found} found so far")
+                    
+        readers = [asyncio.ensure_future(read(dialogs)) for dialogs in iterators]
+        try:
+            await asyncio.gather(*readers)
+        except BaseException:
+            for reader in readers:
+                reader.cancel()
+            raise
+        report_batch()
+            
+        # A cancelled full fetch is incomplete, so it must not replace the cache
+        if incremental or self.cancelled:
+            self.dialog_cache.update(fetched)
+        else:
+            self.dialog_cache.replace(fetched)
+            
+        if self.cancelled:
+            message = f"Fetch cancelled after {found} groups"
+        elif incremental:
+            self.progress(100)
+            message = f"Refreshed {found} changed groups"
+        else:
+            self.progress(100)
+            message = f"Found {found} groups"
+        self.status(message)
+        return fetched, message
+        
+    async def resolve_keep_entries(self, entries):
+        """Look up keep list entries on Telegram, caching what is found and what is not
+        
+        Usernames are resolved and invite links checked concurrently, paced by
+        their own rate limiter and retried after flood waits like leaves.
+        Returns the resolved entries {entry: group ID}, the failures
+        {entry: reason} and a summary.
+        """
+        client = await self.ensure_client()
+        api = telethon_api()
+        resolved = {}
+        failed = {}
+        final = {}  # failures that will not change on a retry, so they are cached
+        self.status(f"Looking up {len(entries)} keep list entries on Telegram...")
+        self.progress(0)
+        
+        async def resolve(entry):
+            kind, value = entry
+            try:
+                if kind == 'invite':
+                    invite = await self.send_scheduled(client, api.CheckChatInviteRequest(value))
+                    entity = getattr(invite, 'chat', None)
+                    if entity is None:
+                        final[entry] = "invite link of a group you are not a member of"
+                        return
+                else:
+                    found = await self.send_scheduled(client, api.ResolveUsernameRequest(value))
+                    peer_id = getattr(found.peer, 'channel_id', getattr(found.peer, 'chat_id', None))
+                    entity = next((chat for chat in found.chats if chat.id == peer_id), None)
+            except Exception as e:
+                if is_flood_wait(e) or not isinstance(e, (ValueError, api.RPCError)):
+                    raise
+                final[entry] = str(e)
+                return
+            if entity is None or getattr(entity, 'title', None) is None:
+                final[entry] = "a user, not a group or channel"
+            else:
+                resolved[entry] = entity.id
+                
+        def report(snapshot):
+            self.progress(snapshot.percent)
+            self.status(snapshot.describe("Looked up", "entries"))
+            
+        tracker = ProgressTracker(len(entries), report)
+        
+        def on_result(entry, status, message):
+            if status == "Failed":
+                failed[entry] = message
+            tracker.add_result("Success" if entry in resolved else "Failed")
+            
+        def on_throttled(entry, seconds):
+            tracker.add_throttled()
+            self.status(f"Rate limited by Telegram, waiting {seconds}s before looking up "
+                        f"{describe_entry(entry)}")
+            
+        if self.resolve_rate_limiter is None:
+            self.resolve_rate_limiter = AdaptiveRateLimiter()
+        self._scheduler = LeaveScheduler(resolve, concurrency=RESOLVE_CONCURRENCY,
+                                         rate_limiter=self.resolve_rate_limiter)
+        if self.cancelled:
+            self._scheduler.cancel()
+        self._scheduler.set_paused(self._paused)
+        try:
+            await self._scheduler.run(entries, on_result, on_throttled)
+        finally:
+            self._scheduler = None
+            self.resolve_cache.store(resolved, final)
+            tracker.finish()
+            
+        failed.update(final)
+        message = f"Resolved {len(resolved)} of {len(entries)} keep list entries on Telegram"
+        if self.cancelled:
+            message += " before the lookup was cancelled"
+        else:
+            self.progress(100)
+        self.status(message)
+        return resolved, failed, message
+        
+    def report_progress(self, snapshot):
+        """Forward a coalesced leave progress snapshot to the callbacks"""
+        self.progress(snapshot.percent)
+        self.status(snapshot.describe())
+        if self.on_snapshot:
+            self.on_snapshot(snapshot)
+            
+    async def leave_group(self, client, group):
+        """Leave a single group or channel with one request, using the fetched input peer"""
+        api = telethon_api()
+        if group.type.is_channel:
+            await self.send_scheduled(client, api.LeaveChannelRequest(
+                api.InputChannel(group.id, group.access_hash)
+            ))
+        else:
+            await self.send_scheduled(client, api.DeleteChatUserRequest(
+                chat_id=group.id,
+                user_id=api.InputUserSelf()
+            ))
+            
+    async def leave_groups(self, groups_to_leave):
+        """Leave the specified groups as a new journaled job
+        
+        Returns a list of (group, status, message) results and a summary.
+        """
+        if self.cancelled:
+            # Not even journaled, so there is nothing to resume
+            return [], "Cancelled before leaving any groups"
+        await self.ensure_client()
+        # The new job replaces an interrupted one; the groups that one left
+        # are gone even if it crashed before dropping them from the cache
+        old_job_id = self.journal.interrupted_job()
+        while old_job_id is not None:
+            self.dialog_cache.remove(self.journal.finish(old_job_id))
+            old_job_id = self.journal.interrupted_job()
+        job_id = self.journal.start(groups_to_leave)
+        self.status(f"Leaving {len(groups_to_leave)} groups...")
+        return await self.run_leave_job(job_id, groups_to_leave)
+        
+    async def resume_leave_job(self):
+        """Continue the last interrupted leave job, skipping groups that already have a result"""
+        await self.ensure_client()
+        job_id = self.journal.interrupted_job()
+        if job_id is None:
+            message = "No interrupted leave job to resume"
+            self.status(message)
+            return [], message
+        groups_to_leave = self.journal.pending(job_id)
+        self.status(f"Resuming interrupted job: {len(groups_to_leave)} groups left to process...")
+        return await self.run_leave_job(job_id, groups_to_leave)
+        
+    async def run_leave_job(self, job_id, groups_to_leave):
+        """Leave the groups of a journaled job, recording every result"""
+        client = await self.ensure_client()
+        results = []
+        tracker = ProgressTracker(len(groups_to_leave), self.report_progress)
+        
+        def on_result(group, status, message):
+            results.append((group, status, message))
+            self.journal.record(job_id, group, status, message)
+            tracker.add_result(status)
+            
+        def on_throttled(group, seconds):
+            tracker.add_throttled()
+            self.status(f"Rate limited by Telegram, waiting {seconds}s "
+                        f"before retrying {group.name}")
+            
+        def on_request(group, status, error, latency, attempt):
+            if status == "Retrying":
+                operation = ('LeaveChannelRequest' if group.type.is_channel
+                             else 'DeleteChatUserRequest')
+                self.metrics.observe_retry(self.name, operation)
+            self.operation_log.write(
+                account=self.name, job=job_id, action='leave',
+                group_id=group.id, group_name=group.name, group_type=group.type.value,
+                status=status, error=type(error).__name__ if error else None,
+                message=str(error) if error else None,
+                latency_ms=round(latency * 1000, 1), attempt=attempt
+            )
+            
+        # The limiter outlives the job so what it learned carries over to the next one
+        if self.rate_limiter is None:
+            self.rate_limiter = AdaptiveRateLimiter()
+        self._scheduler = LeaveScheduler(lambda group: self.leave_group(client, group),
+                                         rate_limiter=self.rate_limiter)
+        if self.cancelled:
+            self._scheduler.cancel()
+        self._scheduler.set_paused(self._paused)
+        try:
+            await self._scheduler.run(groups_to_leave, on_result, on_throttled, on_request)
+        finally:
+            self._scheduler = None
+            # Keep what was done even if the job is cancelled or crashes
+            self.journal.flush()
+            tracker.finish()
+            
+        if self.cancelled:
+            # The job stays open in the journal so the rest can be resumed later
+            self.dialog_cache.remove(group.id for group, status, _ in results
+                                     if status == "Success")
+            message = (f"Cancelled after {len(results)} of {len(groups_to_leave)} groups; "
+                       "the rest can be resumed later")
+        else:
+            # Include groups left before an interruption, which the cache may still list
+            self.dialog_cache.remove(self.journal.finish(job_id))
+            self.progress(100)
+            message = f"Operation complete. Details logged to {self.operation_log.path}"
+        await asyncio.get_event_loop().run_in_executor(None, self.operation_log.flush)
+        self.status(message)
+        return results, message
@@ -0,0 +1,331 @@
+"""
+Fake Telegram backend for the Group & Channel Manager
+
+A local stand-in for the parts of Telethon's TelegramClient the engine uses:
+start, get_dialogs / iter_dialogs, get_entity and the LeaveChannelRequest,
+DeleteChatUserRequest, ResolveUsernameRequest and CheckChatInviteRequest
+calls. The fake account is synthetic, with any number of groups, channels
+and private chats, and requests take a configurable latency and can fail
+with flood waits. Dialogs are real Telethon objects, so the engine parses
+them exactly as it parses a real account, and every request goes through
+the client's _call method, as with Telethon.
+
+    backend = FakeBackend(dialogs=20000, latency=0.05, flood_rate=0.01)
+    with backend.installed():
+        groups, message = await engine.fetch_groups()
+"""
+
+import random
+import asyncio
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from telethon import errors, utils
+from telethon.helpers import TotalList
+from telethon.tl import custom, functions, types
+from telethon.tl.functions.channels import LeaveChannelRequest
+from telethon.tl.functions.messages import DeleteChatUserRequest, GetDialogsRequest
+
+import telegram_engine
+
+# Dialogs returned per GetDialogs request, as Telegram does
+DIALOG_PAGE_SIZE = 100
+
+# Share of each kind of dialog in a synthetic account
+DIALOG_MIX = [
+    ('supergroup', 0.40),
+    ('channel', 0.20),
+    ('group', 0.15),
+    ('user', 0.25),
+]
+
+NAME_WORDS = ["Family", "Work", "Crypto", "News", "Football", "Python", "Music", "Travel",
+              "Books", "Deals", "Gaming", "Photo", "Startup", "Local", "Study", "Memes"]
+
+class FakeBackend:
+    """Synthetic Telegram account shared by the fake clients created for it
+    
+    latency and jitter are seconds added to every request, flood_rate is the
+    chance that a request fails with a flood wait of flood_seconds, and
+    archived is the share of dialogs kept in the archive folder. The seed makes
+    the account and the injected failures reproducible.
+    """
+    
+    def __init__(self, dialogs=10000, latency=0.0, jitter=0.0, flood_rate=0.0,
+                 flood_seconds=1, archived=0.15, pinned=5, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.flood_rate = flood_rate
+        self.flood_seconds = flood_seconds
+        self.requests = 0
+        self.flood_waits = 0
+        self.left = 0
+        self._random = random.Random(seed)
+        self._dialogs = {}   # peer ID -> (TL dialog, entity, message date)
+        self._listings = {}  # folder -> sorted dialogs, until the next leave
+        self.invites = {}    # invite link hash -> peer ID of a group or channel
+        self.me = types.User(1, is_self=True, access_hash=0, first_name="Benchmark")
+        self._generate(dialogs, archived, pinned)
+        
+    def _generate(self, count, archived, pinned):
+        """Create the account's dialogs, newest first"""
+        rng = self._random
+        kinds = [kind for kind, _ in DIALOG_MIX]
+        weights = [share for _, share in DIALOG_MIX]
+        now = datetime.now(timezone.utc)
+        for index in range(count):
+            kind = rng.choices(kinds, weights)[0]
+            name = f"{rng.choice(NAME_WORDS)} {rng.choice(NAME_WORDS)} {index}"
+            date = now - timedelta(minutes=index * 30 + rng.randint(0, 29))
+            username = f"{name.replace(' ', '_').lower()}" if rng.random() < 0.3 else None
+            entity_id = 1_000_000 + index
+            if kind == 'group':
+                entity = types.Chat(entity_id, name, types.ChatPhotoEmpty(),
+                                    participants_count=rng.randint(2, 200), date=date, version=1)
+                peer = types.PeerChat(entity_id)
+            elif kind == 'user':
+                entity = types.User(entity_id, access_hash=rng.getrandbits(63), first_name=name,
+                                    username=username)
+                peer = types.PeerUser(entity_id)
+            else:
+                entity = types.Channel(entity_id, name, types.ChatPhotoEmpty(), date,
+                                       broadcast=kind == 'channel',
+                                       megagroup=kind == 'supergroup',
+                                       access_hash=rng.getrandbits(63), username=username,
+                                       participants_count=(rng.randint(10, 200000)
+                                                           if rng.random() < 0.5 else None))
+                peer = types.PeerChannel(entity_id)
+                
+            muted = rng.random() < 0.3
+            dialog = types.Dialog(
+                peer=peer,
+                top_message=count - index,
+                read_inbox_max_id=0,
+                read_outbox_max_id=0,
+                unread_count=rng.choice([0, 0, 0, rng.randint(1, 500)]),
+                unread_mentions_count=0,
+                unread_reactions_count=0,
+                unread_poll_votes_count=0,
+                notify_settings=types.PeerNotifySettings(
+                    mute_until=datetime(2038, 1, 1, tzinfo=timezone.utc) if muted else None),
+                pinned=index < pinned or None,
+                folder_id=1 if rng.random() < archived else None
+            )
+            self._dialogs[utils.get_peer_id(peer)] = (dialog, entity, date)
+            if kind != 'user':
+                self.invites[f"{rng.getrandbits(64):016x}"] = utils.get_peer_id(peer)
+                
+    def __len__(self):
+        return len(self._dialogs)
+        
+    def client(self, *args, flood_sleep_threshold=60, **kwargs):
+        """Create a client for this account; takes TelegramClient's arguments"""
+        return FakeTelegramClient(self, flood_sleep_threshold)
+        
+    @contextmanager
+    def installed(self):
+        """Make engines create clients of this account instead of real ones"""
+        original = telegram_engine.TelegramEngine.client_class
+        telegram_engine.TelegramEngine.client_class = self.client
+        try:
+            yield self
+        finally:
+            telegram_engine.TelegramEngine.client_class = original
+            
+    def dialogs(self, folder=None):
+        """Return the (TL dialog, entity, date) of each dialog in the folder, pinned then newest first
+        
+        As with Telethon, folder None lists every dialog and folder 0 the ones
+        outside the archive.
+        """
+        listing = self._listings.get(folder)
+        if listing is None:
+            entries = self._dialogs.values()
+            if folder is not None:
+                entries = [entry for entry in entries if (entry[0].folder_id or 0) == folder]
+            listing = self._listings[folder] = sorted(
+                entries, key=lambda entry: (not entry[0].pinned, -entry[2].timestamp()))
+        return listing
+        
+    def dialogs_page(self, request):
+        """Answer a GetDialogsRequest; the fake pages by position, passed as offset_id"""
+        listing = self.dialogs(request.folder_id)
+        page = listing[request.offset_id:request.offset_id + request.limit]
+        entities = [entity for _, entity, _ in page]
+        return types.messages.DialogsSlice(
+            count=len(listing),
+            dialogs=[dialog for dialog, _, _ in page],
+            messages=[types.Message(dialog.top_message, dialog.peer, date=date, message='')
+                      for dialog, _, date in page],
+            chats=[entity for entity in entities if not isinstance(entity, types.User)],
+            users=[entity for entity in entities if isinstance(entity, types.User)]
+        )
+        
+    def entity(self, peer_id):
+        """Return the entity of a dialog by marked peer ID, or None if it was left"""
+        entry = self._dialogs.get(peer_id)
+        return entry[1] if entry else None
+        
+    def entity_by_username(self, username):
+        """Return the entity with the given username, or None"""
+        username = username.lower()
+        for _, entity, _ in self._dialogs.values():
+            if (getattr(entity, 'username', None) or '').lower() == username:
+                return entity
+        return None
+        
+    async def round_trip(self, request=None):
+        """Wait for one request's latency and fail it with a flood wait at the configured rate"""
+        self.requests += 1
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            await asyncio.sleep(delay)
+        if self.flood_rate and self._random.random() < self.flood_rate:
+            self.flood_waits += 1
+            raise errors.FloodWaitError(request, capture=self.flood_seconds)
+            
+    def leave(self, peer_id, request):
+        """Remove a dialog from the account"""
+        if self._dialogs.pop(peer_id, None) is None:
+            raise errors.UserNotParticipantError(request)
+        self._listings.clear()
+        self.left += 1
+
+class FakeDialogIterator:
+    """Async iterator over dialogs that requests them a page at a time, like Telethon's"""
+    
+    def __init__(self, client, limit=None, folder=None):
+        self.client = client
+        self.total = None
+        self._left = limit
+        self._folder = folder
+        self._buffer = deque()
+        self._position = 0
+        self._done = False
+        
+    def __aiter__(self):
+        return self
+        
+    async def __anext__(self):
+        if not self._buffer and not self._done:
+            await self._load_page()
+        if not self._buffer:
+            raise StopAsyncIteration
+        return self._buffer.popleft()
+        
+    async def _load_page(self):
+        limit = DIALOG_PAGE_SIZE if self._left is None else min(self._left, DIALOG_PAGE_SIZE)
+        response = await self.client(GetDialogsRequest(
+            offset_date=None, offset_id=self._position, offset_peer=types.InputPeerEmpty(),
+            limit=limit, hash=0, folder_id=self._folder))
+        self.total = response.count
+        entities = {utils.get_peer_id(entity): entity
+                    for entity in response.chats + response.users}
+        for dialog, message in zip(response.dialogs, response.messages):
+            self._buffer.append(custom.Dialog(self.client, dialog, entities, message))
+        self._position += len(response.dialogs)
+        if self._left is not None:
+            self._left -= len(response.dialogs)
+        self._done = len(response.dialogs) < limit or self._left == 0
+        
+    async def collect(self):
+        """Load every dialog into a list with the total count"""
+        dialogs = TotalList()
+        async for dialog in self:
+            dialogs.append(dialog)
+        dialogs.total = self.total
+        return dialogs
+
+class FakeTelegramClient:
+    """The part of TelegramClient the engine uses, served by a FakeBackend
+    
+    As with Telethon, flood waits from the server up to the client's
+    flood_sleep_threshold seconds are slept through and the request sent
+    again; longer ones are raised. The threshold passed to a call does not
+    change this; Telethon only uses it for waits it remembers from earlier
+    calls, which the fake does not.
+    """
+    
+    def __init__(self, backend, flood_sleep_threshold=60):
+        self.backend = backend
+        self.flood_sleep_threshold = flood_sleep_threshold
+        self._sender = None
+        self._connected = False
+        
+    async def start(self, phone=None, **kwargs):
+        self._connected = True
+        await self(functions.users.GetUsersRequest([types.InputUserSelf()]))
+        return self
+        
+    async def connect(self):
+        self._connected = True
+        
+    def is_connected(self):
+        return self._connected
+        
+    async def is_user_authorized(self):
+        return True
+        
+    async def disconnect(self):
+        self._connected = False
+        
+    def iter_dialogs(self, limit=None, *, folder=None, archived=None, **kwargs):
+        if archived is not None:
+            folder = 1 if archived else 0
+        return FakeDialogIterator(self, limit, folder)
+        
+    async def get_dialogs(self, *args, **kwargs):
+        return await self.iter_dialogs(*args, **kwargs).collect()
+        
+    async def get_entity(self, entity):
+        """Look up an entity by marked peer ID, which needs no request, or by @username or t.me link"""
+        if isinstance(entity, int):
+            found = self.backend.entity(entity)
+            if found is None:
+                raise ValueError(f'Could not find the input entity for {entity}')
+            return found
+        username = entity.strip().rstrip('/').rsplit('/', 1)[-1].lstrip('@')
+        try:
+            resolved = await self(functions.contacts.ResolveUsernameRequest(username))
+        except errors.UsernameNotOccupiedError as e:
+            raise ValueError(f'No user has "{username}" as username') from e
+        return (resolved.chats + resolved.users)[0]
+        
+    async def __call__(self, request, ordered=False, flood_sleep_threshold=None):
+        return await self._call(self._sender, request, ordered=ordered,
+                                flood_sleep_threshold=flood_sleep_threshold)
+        
+    async def _call(self, sender, request, ordered=False, flood_sleep_threshold=None):
+        backend = self.backend
+        while True:
+            try:
+                await backend.round_trip(request)
+                break
+            except errors.FloodWaitError as e:
+                if e.seconds > self.flood_sleep_threshold:
+                    raise
+                await asyncio.sleep(e.seconds)
+        if isinstance(request, GetDialogsRequest):
+            return backend.dialogs_page(request)
+        if isinstance(request, LeaveChannelRequest):
+            backend.leave(utils.get_peer_id(types.PeerChannel(request.channel.channel_id)), request)
+        elif isinstance(request, DeleteChatUserRequest):
+            backend.leave(utils.get_peer_id(types.PeerChat(request.chat_id)), request)
+        elif isinstance(request, functions.contacts.ResolveUsernameRequest):
+            entity = backend.entity_by_username(request.username)
+            if entity is None:
+                raise errors.UsernameNotOccupiedError(request)
+            users = [entity] if isinstance(entity, types.User) else []
+            return types.contacts.ResolvedPeer(utils.get_peer(entity),
+                                               [] if users else [entity], users)
+        elif isinstance(request, functions.messages.CheckChatInviteRequest):
+            entity = backend.entity(backend.invites.get(request.hash))
+            if entity is None:
+                raise errors.InviteHashExpiredError(request)
+            return types.ChatInviteAlready(entity)
+        elif isinstance(request, functions.users.GetUsersRequest):
+            return [backend.me]
+        else:
+            raise NotImplementedError(f"{type(request).__name__} is not faked")
+        return types.Updates([], [], [], datetime.now(timezone.utc), 0)
@@ -0,0 +1,192 @@
+"""
+Keep/leave rules for the Telegram Group & Channel Manager
+
+A rule file holds one rule per line; lines starting with # are comments. The
+first rule that matches a group decides whether it is kept or left, and
+groups that no rule matches fall back to the keep list. For example:
+
+    # regular expression search on the name
+    keep name ~ (?i)family|work
+    # group, supergroup or channel
+    keep type = channel
+    # days since the last message
+    leave inactive > 90
+    # member count, for groups where Telegram reported it
+    leave members < 50
+    # keep dialogs with unread messages, then leave the other muted ones
+    keep unread > 0
+    leave muted = yes
+    # dialogs in the archive folder
+    leave archived = yes
+    keep id = 1234567890
+
+Rules are compiled once into predicates and evaluated over the whole group
+list in a single pass.
+"""
+
+import os
+import re
+import time
+import operator
+
+from telegram_engine import ARCHIVE_FOLDER, KEEP_RULES_FILE, GroupType
+
+COMPARISONS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '=': operator.eq,
+    '!=': operator.ne,
+}
+
+CONDITION_PATTERN = re.compile(r'^(\w+)\s*(!~|~|<=|>=|!=|<|>|=)\s*(.+)$')
+
+NUMERIC_FIELDS = {
+    'id': lambda group, now: group.id,
+    'members': lambda group, now: group.participants_count,
+    'unread': lambda group, now: group.unread_count,
+    'inactive': lambda group, now: (None if group.last_date is None
+                                    else (now - group.last_date) / 86400),
+}
+
+# Fields compared with yes or no; None means unknown and never matches
+FLAG_FIELDS = {
+    'muted': lambda group: group.muted,
+    'archived': lambda group: None if group.folder is None else group.folder == ARCHIVE_FOLDER,
+}
+
+FIELDS = "name, type, " + ", ".join(FLAG_FIELDS) + ", " + ", ".join(NUMERIC_FIELDS)
+
+class RuleError(ValueError):
+    """Raised for a rule that cannot be parsed"""
+
+class Rule:
+    """One compiled rule: matches(group, now) tells whether it applies to a group"""
+    __slots__ = ('keep', 'text', 'line', 'matches')
+    
+    def __init__(self, keep, text, line, matches):
+        self.keep = keep
+        self.text = text
+        self.line = line
+        self.matches = matches
+        
+    def __repr__(self):
+        return f"Rule({self.text!r})"
+
+def compile_rule(text, line=0):
+    """Parse one rule into a Rule with a precompiled predicate"""
+    action, _, condition = text.partition(' ')
+    if action not in ('keep', 'leave'):
+        raise RuleError(f"expected '<keep|leave> <field> <operator> <value>', got {text!r}")
+    return Rule(action == 'keep', text, line, compile_condition(condition.strip()))
+
+def compile_condition(text):
+    """Compile '<field> <operator> <value>' into a predicate taking (group, now)
+    
+    Numeric fields never match groups for which the value is unknown.
+    """
+    match = CONDITION_PATTERN.match(text)
+    if not match:
+        raise RuleError(f"expected '<field> <operator> <value>', got {text!r}")
+    field, op, value = match.groups()
+    value = value.strip()
+    
+    if field == 'name':
+        if op not in ('~', '!~'):
+            raise RuleError("'name' is matched with ~ or !~ and a regular expression")
+        try:
+            pattern = re.compile(value)
+        except re.error as e:
+            raise RuleError(f"invalid regular expression {value!r}: {e}")
+        negate = op == '!~'
+        matches = lambda group, now: (pattern.search(group.name or '') is None) == negate
+    elif field == 'type':
+        if op not in ('=', '!='):
+            raise RuleError("'type' is compared with = or !=")
+        try:
+            group_type = GroupType(value.lower())
+        except ValueError:
+            raise RuleError(f"unknown type {value!r}; use group, supergroup or channel")
+        compare = COMPARISONS[op]
+        matches = lambda group, now: compare(group.type, group_type)
+    elif field in FLAG_FIELDS:
+        if op not in ('=', '!=') or value.lower() not in ('yes', 'no'):
+            raise RuleError(f"'{field}' is compared with = or != and yes or no")
+        wanted = (value.lower() == 'yes') == (op == '=')
+        get_flag = FLAG_FIELDS[field]
+        
+        def matches(group, now):
+            flag = get_flag(group)
+            return flag is not None and flag == wanted
+    elif field in NUMERIC_FIELDS:
+        if op not in COMPARISONS:
+            raise RuleError(f"'{field}' is compared with <, <=, >, >=, = or !=")
+        try:
+            number = int(value[:-1] if field == 'inactive' and value.endswith('d') else value)
+        except ValueError:
+            raise RuleError(f"'{field}' needs a whole number, got {value!r}")
+        compare = COMPARISONS[op]
+        get_value = NUMERIC_FIELDS[field]
+        
+        def matches(group, now):
+            actual = get_value(group, now)
+            return actual is not None and compare(actual, number)
+    else:
+        raise RuleError(f"unknown field {field!r}; use {FIELDS}")
+        
+    return matches
+
+class KeepPolicy:
+    """Ordered keep/leave rules; the first rule matching a group decides"""
+    
+    def __init__(self, rules=()):
+        self.rules = list(rules)
+        
+    @classmethod
+    def parse(cls, text):
+        """Compile the rules in a rule file's text"""
+        rules = []
+        for number, line in enumerate(text.splitlines(), 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                rules.append(compile_rule(line, number))
+            except RuleError as e:
+                raise RuleError(f"Line {number}: {e}")
+        return cls(rules)
+        
+    @classmethod
+    def load(cls, path=KEEP_RULES_FILE):
+        """Compile the rule file, or return an empty policy if there is none"""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.parse(f.read())
+            
+    def __len__(self):
+        return len(self.rules)
+        
+    def apply(self, groups, keep_ids):
+        """Decide every group in one pass
+        
+        Returns the groups to leave and the overrides: (group, keep, rule) for
+        each group whose rule decision differs from its keep list entry.
+        """
+        now = time.time()
+        rules = self.rules
+        groups_to_leave = []
+        overrides = []
+        for group in groups:
+            selected = group.id in keep_ids
+            keep = selected
+            for rule in rules:
+                if rule.matches(group, now):
+                    keep = rule.keep
+                    if keep != selected:
+                        overrides.append((group, keep, rule))
+                    break
+            if not keep:
+                groups_to_leave.append(group)
+        return groups_to_leave, overrides
@@ -0,0 +1,92 @@
+"""
+Tests for flood wait handling, run through the real TelegramClient._call
+
+Telegram's replies come from a stub sender, so nothing is sent over the
+network.
+"""
+
+import asyncio
+
+from telethon import errors
+from telethon.tl import functions, types
+
+from telegram_engine import TelegramEngine
+
+class StubSender:
+    """Answers requests in order with the given replies; exceptions are raised"""
+    
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.sent = []
+        
+    def send(self, request, ordered=False):
+        self.sent.append(request)
+        future = asyncio.get_running_loop().create_future()
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            future.set_exception(reply)
+        else:
+            future.set_result(reply)
+        return future
+
+def flood_wait(request, seconds=1):
+    return errors.FloodWaitError(request, capture=seconds)
+
+def make_client(*replies):
+    engine = TelegramEngine(1, "hash", "+10000000000", session_name=None)
+    client = engine.new_client()
+    client._sender = StubSender(*replies)
+    return engine, client
+
+def leave_request():
+    return functions.channels.LeaveChannelRequest(types.InputChannel(1, 2))
+
+def test_scheduled_request_raises_flood_wait():
+    request = leave_request()
+    engine, client = make_client(flood_wait(request))
+    try:
+        asyncio.run(engine.send_scheduled(client, request))
+    except errors.FloodWaitError as e:
+        assert e.seconds == 1
+    else:
+        raise AssertionError("the flood wait was slept through")
+    assert len(client._sender.sent) == 1
+
+def test_other_requests_wait_out_flood_waits():
+    request = functions.help.GetConfigRequest()
+    engine, client = make_client(flood_wait(request), True)
+    assert asyncio.run(client(request)) is True
+    assert len(client._sender.sent) == 2
+
+def test_long_flood_waits_are_raised():
+    request = functions.help.GetConfigRequest()
+    engine, client = make_client(flood_wait(request, seconds=3600))
+    try:
+        asyncio.run(client(request))
+    except errors.FloodWaitError as e:
+        assert e.seconds == 3600
+    else:
+        raise AssertionError("an hour-long flood wait was slept through")
+
+def request_stats(engine, request):
+    return engine.metrics.requests[(engine.name, type(request).__name__)]
+
+def test_flood_waits_and_retries_are_counted():
+    request = functions.help.GetConfigRequest()
+    engine, client = make_client(flood_wait(request, 0), flood_wait(request, 0), True)
+    asyncio.run(client(request))
+    stats = request_stats(engine, request)
+    assert stats.flood_waits == 2
+    assert stats.retries == 2
+    assert stats.latency.count == 3
+
+def test_raised_flood_waits_are_not_retries():
+    request = leave_request()
+    engine, client = make_client(flood_wait(request))
+    try:
+        asyncio.run(engine.send_scheduled(client, request))
+    except errors.FloodWaitError:
+        pass
+    stats = request_stats(engine, request)
+    assert stats.flood_waits == 1
+    assert stats.retries == 0
@@ -0,0 +1,80 @@
+"""
+Tests for resolving imported keep list entries, against the fake Telegram backend
+"""
+
+import asyncio
+
+from telethon.tl import types
+
+from telegram_engine import (DialogCache, GroupRecord, GroupType, ResolutionCache,
+                             TelegramEngine, resolve_keep_entries_locally)
+from telegram_fake import FakeBackend
+
+def public_chats(backend):
+    """Return the groups and channels of the fake account that have a username"""
+    return [entity for _, entity, _ in backend.dialogs()
+            if not isinstance(entity, types.User) and getattr(entity, 'username', None)]
+
+def make_engine(tmp_path, cache):
+    return TelegramEngine(1, "hash", "+10000000000", session_name=None,
+                          dialog_cache=DialogCache(str(tmp_path / 'dialogs.db')),
+                          resolve_cache=cache)
+
+def resolve(backend, engine, entries):
+    """Look up entries on the fake account; return the results and the requests sent"""
+    async def run():
+        with backend.installed():
+            try:
+                return await engine.resolve_keep_entries(entries)
+            finally:
+                await engine.disconnect()
+    before = backend.requests
+    resolved, failed, _ = asyncio.run(run())
+    # Starting the client sends one request of its own
+    return resolved, failed, backend.requests - before - 1
+
+def invite_of(backend, entity):
+    return next(invite for invite, peer_id in backend.invites.items()
+                if backend.entity(peer_id) is entity)
+
+def test_fetched_groups_resolve_without_requests(tmp_path):
+    backend = FakeBackend(dialogs=200)
+    known, other = public_chats(backend)[:2]
+    groups = [GroupRecord(known.id, known.title, GroupType.CHANNEL, username=known.username)]
+    entries = [('id', 42), ('username', known.username.lower()), ('username', other.username.lower())]
+    cache = ResolutionCache(str(tmp_path / 'resolved.db'))
+    
+    resolved, failed, remaining = resolve_keep_entries_locally(entries, groups, cache)
+    assert resolved == {('id', 42): 42, ('username', known.username.lower()): known.id}
+    assert failed == {}
+    assert remaining == [('username', other.username.lower())]
+    
+    resolved, failed, requests = resolve(backend, make_engine(tmp_path, cache), remaining)
+    assert resolved == {('username', other.username.lower()): other.id}
+    assert requests == 1
+
+def test_lookups_are_cached(tmp_path):
+    backend = FakeBackend(dialogs=200)
+    chat = public_chats(backend)[0]
+    entries = [('invite', invite_of(backend, chat)), ('username', 'no_such_group')]
+    cache = ResolutionCache(str(tmp_path / 'resolved.db'))
+    
+    resolved, failed, requests = resolve(backend, make_engine(tmp_path, cache), entries)
+    assert resolved == {entries[0]: chat.id}
+    assert list(failed) == [entries[1]]
+    assert requests == 2
+    
+    resolved, failed, remaining = resolve_keep_entries_locally(entries, [], cache)
+    assert resolved == {entries[0]: chat.id}
+    assert list(failed) == [entries[1]]
+    assert remaining == []
+
+def test_failures_are_retried_after_their_ttl(tmp_path):
+    backend = FakeBackend(dialogs=200)
+    entries = [('username', 'no_such_group')]
+    path = str(tmp_path / 'resolved.db')
+    resolve(backend, make_engine(tmp_path, ResolutionCache(path)), entries)
+    
+    resolved, failed, remaining = resolve_keep_entries_locally(
+        entries, [], ResolutionCache(path, failure_ttl=-1))
+    assert (resolved, failed, remaining) == ({}, {}, entries)
@@ -0,0 +1,80 @@
+"""
+Tests for parsing keep lists to import
+"""
+
+import io
+
+import pytest
+
+from telegram_cli import main, write_groups
+from telegram_engine import Account, GroupRecord, GroupType, parse_keep_entry, parse_keep_list
+
+def fetched_groups():
+    return [
+        GroupRecord(1001, "Family, Friends", GroupType.GROUP),
+        GroupRecord(1002, "Python News", GroupType.CHANNEL, username="Python_News"),
+        GroupRecord(1003, "Deals", GroupType.SUPERGROUP, access_hash=42, username="deals_chat",
+                    participants_count=250, muted=True, folder=1),
+    ]
+
+def fetch_csv(groups, accounts=1):
+    output = io.StringIO()
+    write_groups([(Account(f"account{index}", '', '', ''), groups) for index in range(accounts)],
+                 'csv', output)
+    return output.getvalue()
+
+def test_fetch_csv_round_trip():
+    entries, invalid = parse_keep_list(fetch_csv(fetched_groups()))
+    assert invalid == []
+    assert entries == [('id', 1001), ('id', 1002), ('username', 'python_news'),
+                       ('id', 1003), ('username', 'deals_chat')]
+
+def test_fetch_csv_of_several_accounts():
+    entries, invalid = parse_keep_list(fetch_csv(fetched_groups(), accounts=2))
+    assert invalid == []
+    assert len(entries) == 5
+
+def test_username_column_only():
+    entries, invalid = parse_keep_list("username\nfoo_channel\n@Bar_Group\n\n")
+    assert entries == [('username', 'foo_channel'), ('username', 'bar_group')]
+    assert invalid == []
+
+def test_plain_text_list():
+    text = ("# groups to keep\n"
+            "foo_channel\n"
+            "@bar_group, https://t.me/baz_chat\n"
+            "-1001234567890 t.me/c/555/10\n"
+            "https://t.me/+AbCdEf123 t.me/joinchat/XyZ987\n")
+    entries, invalid = parse_keep_list(text)
+    assert entries == [('username', 'foo_channel'), ('username', 'bar_group'),
+                       ('username', 'baz_chat'), ('id', 1234567890), ('id', 555),
+                       ('invite', 'AbCdEf123'), ('invite', 'XyZ987')]
+    assert invalid == []
+
+def test_invalid_entries():
+    entries, invalid = parse_keep_list("bad! @ab x_y t.me/+123456\nok_name")
+    assert entries == [('username', 'ok_name')]
+    assert invalid == ['bad!', '@ab', 'x_y', 't.me/+123456']
+
+def test_duplicates_are_dropped():
+    entries, _ = parse_keep_list("Foo_Channel @foo_channel t.me/foo_channel 7 -7")
+    assert entries == [('username', 'foo_channel'), ('id', 7)]
+
+def test_parse_keep_entry():
+    assert parse_keep_entry("tg://resolve?domain=Some_Group") == ('username', 'some_group')
+    assert parse_keep_entry("https://t.me/s/news_feed") == ('username', 'news_feed')
+    assert parse_keep_entry("-4567") == ('id', 4567)
+    assert parse_keep_entry("1digit_first") is None
+
+@pytest.mark.parametrize('argv', [
+    ['leave', '--refresh', 'none', '--dry-run'],
+    ['import-keep', 'keep.csv', '--no-remote'],
+])
+def test_missing_keep_file_is_an_error(tmp_path, argv):
+    missing = str(tmp_path / 'missing.txt')
+    with pytest.raises(SystemExit, match="Keep file not found"):
+        main(argv + ['--keep-file', missing])
+
+def test_missing_rules_file_is_an_error(tmp_path):
+    with pytest.raises(SystemExit, match="Rules file not found"):
+        main(['leave', '--refresh', 'none', '--dry-run', '--rules', str(tmp_path / 'missing.rules')])